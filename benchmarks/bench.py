@@ -0,0 +1,154 @@
+'''
+Benchmarks of the constructions in simplicial_operators.
+
+Each case is timed with all caches of the package emptied beforehand, keeping 
+the best of several repetitions, and its peak memory is measured in a separate 
+run with tracemalloc. The on-disk store is disabled during the run, so the 
+constructions are computed rather than loaded and no files are written.
+
+Usage:
+
+    python benchmarks/bench.py run [--output FILE] [--repeat R] [--filter TEXT]
+    python benchmarks/bench.py compare BASELINE FILE [--threshold T]
+
+compare exits with status 1 if some case got slower, or used more memory, by 
+more than the threshold factor with respect to the baseline.
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simplicial_operators as so
+from simplicial_operators import aw_ez_shih, barratt_eccles, cartan, steenrod, store
+
+def cartan_elements(i):
+    return so.cartan_first_homotopy(i) ^ so.cartan_second_homotopy(i)
+
+# name: (function, arguments)
+CASES = {}
+for n in (6, 10, 14):
+    CASES[f'eilenberg_zilber[n={n}]'] = (so.eilenberg_zilber, (n,), {'all_bidegrees': True})
+for n in (6, 9, 12):
+    CASES[f'shih[n={n}]'] = (so.shih, (n,), {})
+for i, n in ((2, 12), (4, 16), (6, 20)):
+    CASES[f'steenrod_diagonal[i={i},n={n}]'] = (so.steenrod_diagonal, (i, n), {})
+for n in (8, 12, 16):
+    CASES[f'surjection_operator[n={n}]'] = (so.surjection_operator, ((1,2,1,2,1,2), n), {})
+for i in (4, 6, 8):
+    CASES[f'table_reduction[i={i}]'] = (lambda i: so.table_reduction(cartan_elements(i)), (i,), {})
+for i, n in ((3, 7), (4, 9)):
+    CASES[f'barratt_eccles_operator[i={i},n={n}]'] = (
+        lambda i, n: so.barratt_eccles_operator(cartan_elements(i), n), (i, n), {})
+for i, n in ((2, 10), (3, 12), (4, 12)):
+    CASES[f'cartan_operator[i={i},n={n}]'] = (so.cartan_operator, (i, n), {})
+
+def clear_caches():
+    for module in (aw_ez_shih, barratt_eccles, cartan, steenrod):
+        module.cache_clear()
+    so.Operator.compose_cache_clear()
+
+def measure(function, args, kwargs, repeat):
+    '''returns the best time in seconds and the peak memory in bytes of a call'''
+
+    best = float('inf')
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    clear_caches()
+    tracemalloc.start()
+    function(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], 
+                                capture_output=True, text=True, 
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit}
+
+def run(args):
+    results = {}
+    directory = store.get_directory()
+    store.set_directory(None)
+    try:
+        for name, (function, fargs, kwargs) in CASES.items():
+            if args.filter and args.filter not in name:
+                continue
+            seconds, peak = measure(function, fargs, kwargs, args.repeat)
+            results[name] = {'time': seconds, 'peak_memory': peak}
+            print(f'{name:45} {seconds:10.4f} s {peak/2**20:10.2f} MiB', flush=True)
+    finally:
+        store.set_directory(directory)
+
+    report = {'metadata': metadata(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    return 0
+
+def compare(args):
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+    with open(args.current) as file:
+        current = json.load(file)['results']
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        line = f'{name:45}'
+        for key in ('time', 'peak_memory'):
+            old, new = baseline[name][key], current[name][key]
+            ratio = new / old if old else 1.0
+            flag = ' !' if ratio > args.threshold else '  '
+            regressions += ratio > args.threshold
+            line += f' {key} x{ratio:7.2f}{flag}'
+        print(line)
+
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f'{name:45} only in {"baseline" if name in baseline else "current"}')
+
+    print(f'{regressions} regression(s) above x{args.threshold}')
+
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time every case')
+    run_parser.add_argument('--output', help='JSON file to store the results')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--filter', help='only run cases containing this text')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=1.25)
+
+    args = parser.parse_args(argv)
+
+    return run(args) if args.command == 'run' else compare(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
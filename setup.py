@@ -8,4 +8,8 @@ setup(name='simplicial_operators',
       author_email='anibal.medinamardones@epfl.ch',
       license='MIT',
       packages=['simplicial_operators'],
+      install_requires=['numpy'],
+      extras_require={'sparse': ['scipy']},
+      entry_points={'console_scripts': 
+                    ['simplicial-operators-batch=simplicial_operators.batch:main']},
       zip_safe=False)
@@ -1,13 +1,29 @@
 from ._utils import partitions
 from ._utils import harmonic_partitions
+from ._utils import compositions
+from ._utils import shuffles
 from .base_class import Operator
+from .base_class import F2Chain
 from .aw_ez_shih import alexander_whitney
 from .aw_ez_shih import eilenberg_zilber
+from .aw_ez_shih import iter_eilenberg_zilber
 from .aw_ez_shih import shih
+from .aw_ez_shih import iter_shih
 from .steenrod import steenrod_diagonal
+from .steenrod import iter_steenrod_diagonal
 from .surjections import surjection_operator
+from .surjections import iter_surjection_operator
+from .surjections import parallel_surjection_operator
 from .barratt_eccles import table_reduction
 from .barratt_eccles import barratt_eccles_operator
+from .barratt_eccles import parallel_barratt_eccles_operator
+from .operads import permutation_partial
+from .operads import permutation_composition
+from .operads import barratt_eccles_partial
+from .operads import barratt_eccles_composition
+from .operads import surjection_partial
+from .operads import surjection_composition
 from .cartan import cartan_first_homotopy
 from .cartan import cartan_second_homotopy
 from .cartan import cartan_operator
+from .cartan import CartanPipeline
@@ -1,5 +1,5 @@
-from itertools import combinations, product, chain, permutations
-from math import floor
+from itertools import combinations, product
+from math import floor, comb
 
 def partitions(n, k, smallest_value=1, largest_value=None, ordered=False):
     '''n is the integer to partition and k is the length of partitions.
@@ -20,11 +20,47 @@ def partitions(n, k, smallest_value=1, largest_value=None, ordered=False):
                 yield (i,)+result
                 
     if ordered:
-        return chain.from_iterable(set(permutations(p)) for p 
-                                   in unordered_partitions(n,k))
+        return compositions(n, k, smallest_value, largest_value)
     if not ordered:
         return unordered_partitions(n,k)
     
+def compositions(n, k, smallest_value=1, largest_value=None):
+    '''returns all k tuples of integers greater or equal to smallest_value 
+    and less than or equal to largest_value that add to n, in lexicographic 
+    order. Each one is obtained from the previous one in place'''
+    l = smallest_value
+    m = n if largest_value is None else largest_value
+
+    if k == 0:
+        if n == 0:
+            yield ()
+        return
+    if not k*l <= n <= k*m or l > m:
+        return
+
+    def fill(parts, start, remainder):
+        # smallest tuple in lexicographic order from position start on
+        for j in range(start, k):
+            parts[j] = max(l, remainder - (k-j-1)*m)
+            remainder -= parts[j]
+
+    parts = [0]*k
+    fill(parts, 0, n)
+    while True:
+        yield tuple(parts)
+
+        # rightmost part that can grow while the parts after it shrink
+        remainder = 0
+        for j in reversed(range(k-1)):
+            remainder += parts[j+1]
+            if parts[j] < m and remainder > (k-j-1)*l:
+                break
+        else:
+            return
+
+        parts[j] += 1
+        fill(parts, j+1, remainder-1)
+    
 def harmonic_partitions(n,k,smallest_value=1):
     '''returns tuple (a_1,...,a_k) of non-negative integer greater than 
     or equal to smallest_value such that a_1 + 2a_2 + ... + ka_k = n'''
@@ -34,4 +70,23 @@ def harmonic_partitions(n,k,smallest_value=1):
         return
     for i in range(smallest_value, floor(n/k)+1):
         for result in harmonic_partitions(n-(k*i), k-1, smallest_value):
-            yield (i,)+result
\ No newline at end of file
+            yield (i,)+result
+
+def shuffles(p, q, count=False):
+    '''returns a generator of the (p,q)-shuffles, represented by pairs (mu, nu) 
+    of increasing tuples of sizes p and q partitioning range(p+q), in 
+    lexicographic order of mu. If count == True it returns their number instead'''
+    if count:
+        return comb(p+q, p)
+
+    def generate():
+        for mu in combinations(range(p+q), p):
+            nu, k = [], 0
+            for i in range(p+q):
+                if k < p and mu[k] == i:
+                    k += 1
+                else:
+                    nu.append(i)
+            yield mu, tuple(nu)
+
+    return generate()
\ No newline at end of file
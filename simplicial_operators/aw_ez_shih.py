@@ -1,5 +1,13 @@
 from itertools import product
-from .base_class import Operator
+from functools import lru_cache
+from .base_class import Operator, F2Chain
+from ._utils import shuffles
+from .combinatorics import iter_shuffles, count_shuffles, bounds
+from . import instrumentation, store
+
+# maximal number of bidegrees and degrees whose bioperators are kept in memory
+EZ_CACHE_SIZE = 1024
+SHIH_CACHE_SIZE = 64
 
 def alexander_whitney(n, q=None):
     '''if an integer n is passed it returns the linear combination of bioperators defining the 
@@ -20,89 +28,177 @@ def alexander_whitney(n, q=None):
 
         return answer
 
-def eilenberg_zilber(n, q=None, all_bidegrees=False):
+def eilenberg_zilber(n, q=None, all_bidegrees=False, index_range=None):
     '''if a single integer n is passed, it returns a dictionary whose keys are bidegrees adding to n
     and values the bioperators defining the restriction of EZ to that bidegree. If all_bidegrees 
     is True it gives the same but the condition is that bidegrees add up to less than or equal to n.
     
     If a pair of integers p,q is passed it returns the bioperators defining EZ in bidegree (p,q). 
-    If all_bidegrees is true it acts as if a single integer p+q was passed.'''
+    If all_bidegrees is true it acts as if a single integer p+q was passed.
     
-    # operators in bidegree (q,p) acting on elements of bidegree (p,q)
-    if q != None:
-        p = n
-        if (p,q) == (0,0):
-            return {(Operator(), Operator())}
-
-        answer = set()
-        if p > 0:
-            west = eilenberg_zilber(p-1, q)
-            for biop in west:
-                answer ^= {(Operator(deg_maps = biop[0].deg_maps),
-                            Operator(deg_maps = [p+q-1] + list(biop[1].deg_maps)))}
-        if q > 0:
-            south = eilenberg_zilber(p, q-1)
-            for biop in south:
-                answer ^= {(Operator(deg_maps = [p+q-1] + list(biop[0].deg_maps)),
-                            Operator(deg_maps = biop[1].deg_maps))}
-        return answer
+    Each bidegree is computed once and kept in a bounded cache, see cache_info, 
+    and in the on-disk store if one is set, see the module store.
+    
+    If index_range = (start, stop) is passed together with a pair p,q only the 
+    bioperators given by the shuffles with indices in that range are returned, 
+    see iter_eilenberg_zilber.'''
+
+    if index_range is not None:
+        if q is None or all_bidegrees:
+            raise ValueError('index_range requires a single bidegree (p,q)')
+        return F2Chain(iter_eilenberg_zilber(n, q, index_range=index_range))
     
     # dictionary of all bioperators indexed by their bidegrees
     if all_bidegrees:
         if q:
             n += q
-            
-        answer = {(0,0): {(Operator(), Operator())}}
-        for m in range(1, n+1):
-            answer.update({(p,m-p): set() for p in range(m+1)})
-            for i in range(m):
-                j = m-i-1
-                for biop in answer[(i,j)]:
-                    answer[(i,j+1)] ^= {(Operator(deg_maps = biop[0].deg_maps),
-                                         Operator(deg_maps = [i+j] + list(biop[1].deg_maps)))}
-                    
-                    answer[(i+1,j)] ^= {(Operator(deg_maps = [i+j] + list(biop[0].deg_maps)),
-                                         Operator(deg_maps = biop[1].deg_maps))}
-        return answer
+        
+        return {(p,m-p): F2Chain(_eilenberg_zilber_table(m-p, p)) 
+                for m in range(n+1) for p in range(m+1)}
+    
+    # operators in bidegree (q,p) acting on elements of bidegree (p,q)
+    if q != None:
+        return F2Chain(_eilenberg_zilber_table(n, q))
     
     # dictionary of bioperators indexed by bidegrees (0,n), (1,n-1), ... ,(n,0)
-    if q == None and not all_bidegrees:
-        if n == 0:
-            return {(0,0): {(Operator(), Operator())}}
-
-        if n > 0:
-            answer = {(i,n-i): set() for i in range(n+1)}
-            for bidegree, biops in eilenberg_zilber(n-1).items():
-                i, j = bidegree
-                answer[(i,j+1)] ^= {(Operator(deg_maps = biop[0].deg_maps),
-                                     Operator(deg_maps = [i+j] + list(biop[1].deg_maps)))
-                                         for biop in biops}
-
-                answer[(i+1,j)] ^= {(Operator(deg_maps = [i+j] + list(biop[0].deg_maps)),
-                                     Operator(deg_maps = biop[1].deg_maps))
-                                         for biop in biops}
-            return answer
-
-def shih(n):
+    return {(i,n-i): F2Chain(_eilenberg_zilber_table(n-i, i)) for i in range(n+1)}
+
+def iter_eilenberg_zilber(p, q, count=False, index_range=None):
+    '''returns a generator of the bioperators defining EZ on elements of bidegree (p,q),
+    one for each (p,q)-shuffle. If count == True it returns their number instead.
+    
+    If index_range = (start, stop) is passed only the shuffles with indices in 
+    that range are used, in the order of shuffles, see the module combinatorics'''
+
+    if index_range is None:
+        pairs = shuffles(p, q, count)
+    else:
+        start, stop = bounds(index_range, count_shuffles(p, q))
+        pairs = stop - start if count else iter_shuffles(p, q, start, stop)
+
+    if count:
+        return pairs
+
+    # the degeneracies of the second factor are indexed by the first part of the shuffle
+    return ((Operator(deg_maps = reversed(nu)).intern(), 
+             Operator(deg_maps = reversed(mu)).intern()) for mu, nu in pairs)
+
+def shih(n, nondegenerate=False):
     '''returns all bioperators defining the chain homotopy between 
-    EZAW and the identity. Some of them are degenerate.'''
+    EZAW and the identity. Some of them are degenerate, unless 
+    nondegenerate == True, see iter_shih.
     
-    if n == 0:
-        return set()
+    Each n is computed once and kept in a bounded cache, see cache_info, 
+    and in the on-disk store if one is set, see the module store.'''
+
+    if nondegenerate:
+        return F2Chain(iter_shih(n, nondegenerate=True))
     
-    ez = eilenberg_zilber(n)
+    # building the lower levels first keeps the recursion shallow
+    if not store.contains('shih', (n,)):
+        for k in range(1, n):
+            _shih_table(k)
+
+    return F2Chain(_shih_table(n))
+
+def iter_shih(n, nondegenerate=False):
+    '''returns a generator of the bioperators defining the Shih homotopy in
+    degree n, each produced once. If nondegenerate == True only the 
+    nondegenerate ones are produced, and the degenerate ones are never built'''
+
+    if not nondegenerate:
+        return iter(shih(n))
+
+    return _iter_nondegenerate_shih(n)
+
+def cache_info():
+    '''returns the hit, miss and size statistics of the caches used by 
+    eilenberg_zilber and shih'''
+
+    return {'eilenberg_zilber': _eilenberg_zilber_table.cache_info(),
+            'shih': _shih_table.cache_info()}
+
+def cache_clear():
+    '''empties the caches used by eilenberg_zilber and shih'''
+
+    _eilenberg_zilber_table.cache_clear()
+    _shih_table.cache_clear()
+
+@lru_cache(maxsize=EZ_CACHE_SIZE)
+def _eilenberg_zilber_table(p, q):
+    '''returns the frozenset of bioperators defining EZ on elements of bidegree (p,q)'''
+
+    stored = store.load('eilenberg_zilber', (p, q))
+    if stored is not None:
+        return stored
+
+    with instrumentation.timer('eilenberg_zilber[%d,%d]' % (p, q)):
+        answer = frozenset(iter_eilenberg_zilber(p, q))
+
+    if instrumentation.enabled:
+        instrumentation.count('eilenberg_zilber[%d,%d].terms' % (p, q), len(answer))
+
+    store.save('eilenberg_zilber', (p, q), answer)
+
+    return answer
+
+def _ezaw(n):
+    '''returns the bioperators defining the composition EZ AW in degree n'''
+
     aw = alexander_whitney(n)
-    ezaw = set()
+    answer = F2Chain()
     for i in range(n+1):
         a0, a1 = aw[(-i,-n+i)]
-        ezaw ^= {(op0.compose(a0), op1.compose(a1)) for op0, op1 in ez[(i,n-i)]}
+        answer.toggle_all((op0.compose(a0), op1.compose(a1)) 
+                          for op0, op1 in _eilenberg_zilber_table(n-i, i))
+
+    return answer
+
+@lru_cache(maxsize=SHIH_CACHE_SIZE)
+def _shih_table(n):
+    '''returns the frozenset of bioperators defining the Shih homotopy in degree n'''
+
+    if n == 0:
+        return frozenset()
+
+    stored = store.load('shih', (n,))
+    if stored is not None:
+        return stored
+
+    lower = _shih_table(n-1)
+
+    with instrumentation.timer('shih[%d]' % n):
+        ezaw = _ezaw(n)
+            
+        s_0 = Operator(deg_maps=[0])
+        answer = F2Chain()
+        answer.toggle_all((op0.prime().compose(s_0).intern(), 
+                           op1.prime().compose(s_0).intern()) for op0, op1 in ezaw)
         
-    s_0 = Operator(deg_maps=[0])
-    answer = {(op0.prime().compose(s_0), 
-               op1.prime().compose(s_0)) for op0, op1 in ezaw}
-    
-    if n == 1:
-        return answer
+        answer.toggle_all((op0.prime().intern(), op1.prime().intern()) 
+                          for op0, op1 in lower)
+
+    if instrumentation.enabled:
+        instrumentation.count('shih[%d].ezaw_terms' % n, len(ezaw))
+        instrumentation.count('shih[%d].terms' % n, len(answer))
+
+    answer = frozenset(answer)
+    store.save('shih', (n,), answer)
+
+    return answer
+
+def _iter_nondegenerate_shih(n):
 
-    if n > 1:
-        return answer^{(op0.prime(), op1.prime()) for op0, op1 in shih(n-1)}
\ No newline at end of file
+    # the terms of degree n are the (n-k)-th primes of the terms (op0' s_0, op1' s_0) 
+    # for (op0, op1) = (s_nu d_{i+1..k}, s_mu d_{0..i-1}) in EZAW of degree k, 
+    # with (mu, nu) a (i,k-i)-shuffle. Those with i = 0 are degenerate, and the 
+    # others are the distinct nondegenerate (s_{nu+1} s_0 d_{i+1..k}, s_{mu+1} d_{1..i-1})
+    for k in range(1, n+1):
+        t = n-k
+        for i in range(1, k+1):
+            faces0, faces1 = tuple(range(t+i+1, t+k+1)), tuple(range(t+1, t+i))
+            for mu, nu in shuffles(i, k-i):
+                yield (Operator._canonical(tuple(v+t+1 for v in reversed(nu)) + (t,), 
+                                           faces0).intern(),
+                       Operator._canonical(tuple(v+t+1 for v in reversed(mu)), 
+                                           faces1).intern())
\ No newline at end of file
@@ -1,50 +1,141 @@
-from ._utils import partitions
-from .surjections import surjection_operator
+from functools import lru_cache
+from ._utils import compositions
+from .combinatorics import iter_compositions
+from .base_class import F2Chain
+from . import instrumentation
+from .surjections import surjection_operator, parallel_surjection_operator
 
-def table_reduction(bar_ecc_elements):
+# maximal number of compositions lists and of basis elements whose images 
+# under the table reduction are kept in memory
+COMPOSITIONS_CACHE_SIZE = 256
+TABLE_REDUCTION_CACHE_SIZE = 4096
+
+def table_reduction(bar_ecc_elements, index_range=None):
     '''given a set of basis element in the Barratt-Eccles operad, it returns the set of 
-    surjections in its image via the table reduction morphism'''
+    surjections in its image via the table reduction morphism. The image of each 
+    basis element is computed once and kept in a bounded cache, see cache_info.
+    
+    If index_range = (start, stop) is passed only the surjections given by the 
+    compositions of d+a of length d+1 with indices in that range are kept, for 
+    each basis element of dimension d and arity a, see the module combinatorics'''
     
     if not isinstance(bar_ecc_elements, set):
         bar_ecc_elements = {bar_ecc_elements}
     
-    answer = set()
+    answer = F2Chain()
     for bar_ecc_element in bar_ecc_elements:
+        if index_range is None:
+            answer ^= _table_reduction(bar_ecc_element)
+        else:
+            d, a = len(bar_ecc_element)-1, max(bar_ecc_element[0])
+            answer ^= _reduce(bar_ecc_element, 
+                              iter_compositions(d+a, d+1, start=index_range[0], 
+                                                stop=index_range[1]))
+ 
+    return answer
+
+def cache_info():
+    '''returns the hit, miss and size statistics of the caches used by 
+    table_reduction'''
+
+    return {'table_reduction': _table_reduction.cache_info(),
+            'compositions': _compositions.cache_info()}
+
+def cache_clear():
+    '''empties the caches used by table_reduction'''
+
+    _table_reduction.cache_clear()
+    _compositions.cache_clear()
+
+@lru_cache(maxsize=COMPOSITIONS_CACHE_SIZE)
+def _compositions(n, k):
+    '''returns the tuple of all ordered partitions of n of length k'''
+
+    return tuple(compositions(n, k))
+
+@lru_cache(maxsize=TABLE_REDUCTION_CACHE_SIZE)
+def _table_reduction(bar_ecc_element):
+    '''returns the frozenset of surjections in the image of a basis element'''
+
+    d, a = len(bar_ecc_element)-1, max(bar_ecc_element[0]) #dimension and arity
+    answer = _reduce(bar_ecc_element, _compositions(d+a, d+1))
+
+    if instrumentation.enabled:
+        instrumentation.count('table_reduction.elements')
+        instrumentation.count('table_reduction.surjections', len(answer))
+
+    return frozenset(answer)
+
+def _reduce(bar_ecc_element, pis):
+    '''returns the surjections given by an iterable of compositions'''
+
+    answer = F2Chain()
+    for pi in pis:
         
-        d, a = len(bar_ecc_element)-1, max(bar_ecc_element[0]) #dimension and arity
+        surjection, removed = [], []
+        degenerate = False
+        for idx, i in enumerate(pi):
+            filtered =  [i for i in bar_ecc_element[idx] if i not in removed]
 
-        for pi in partitions(d+a, d+1, ordered=True):
-            
-            surjection, removed = [], []
-            degenerate = False
-            for idx, i in enumerate(pi):
-                filtered =  [i for i in bar_ecc_element[idx] if i not in removed]
+            if idx > 0 and surjection[-1] == filtered[0]:
+                degenerate = True
+                break    
 
-                if idx > 0 and surjection[-1] == filtered[0]:
-                    degenerate = True
-                    break    
+            if i > 1:
+                removed += filtered[:i-1]
 
-                if i > 1:
-                    removed += filtered[:i-1]
+            surjection += filtered[:i]
 
-                surjection += filtered[:i]
+        if not degenerate:
+            answer.toggle(tuple(surjection))
 
-            if not degenerate:
-                answer ^= {tuple(surjection)}
- 
     return answer
 
-def barratt_eccles_operator(bar_ecc_elements, n):
+def barratt_eccles_operator(bar_ecc_elements, n, equal_degrees=(), degrees=None, 
+                            nondegenerate=False):
     '''returns the multioperator defining the action of a barratt-eccles 
-    element on simplices of dimension d'''
+    element on simplices of dimension d. See surjection_operator for the 
+    constraints, with nondegenerate also skipping degenerate barratt-eccles 
+    elements, those with two consecutive equal permutations'''
     
     if not isinstance(bar_ecc_elements, set):
         bar_ecc_elements = {bar_ecc_elements}
         
-    answer = set()
-    for bar_ecc_element in bar_ecc_elements:
-        surjections = table_reduction(bar_ecc_element)
-        for surjection in surjections:
-            answer ^= surjection_operator(surjection, n)
+    answer = F2Chain()
+    with instrumentation.timer('barratt_eccles_operator'):
+        for bar_ecc_element in bar_ecc_elements:
+            if nondegenerate and is_degenerate_element(bar_ecc_element):
+                continue
+            surjections = table_reduction(bar_ecc_element)
+            for surjection in surjections:
+                answer ^= surjection_operator(surjection, n, equal_degrees, degrees, 
+                                              nondegenerate)
         
-    return answer
\ No newline at end of file
+    return answer
+
+def parallel_barratt_eccles_operator(bar_ecc_elements, n, equal_degrees=(), degrees=None, 
+                                     nondegenerate=False, max_workers=None, 
+                                     chunksize=None, executor=None):
+    '''returns the same as barratt_eccles_operator, sharding the surjections in 
+    the image of the table reduction across the processes of a pool, see 
+    parallel_surjection_operator'''
+
+    if not isinstance(bar_ecc_elements, set):
+        bar_ecc_elements = {bar_ecc_elements}
+
+    if nondegenerate:
+        bar_ecc_elements = {element for element in bar_ecc_elements 
+                            if not is_degenerate_element(element)}
+
+    surjections = set(table_reduction(bar_ecc_elements))
+
+    return parallel_surjection_operator(surjections, n, equal_degrees, degrees, 
+                                        nondegenerate, max_workers, chunksize, 
+                                        executor)
+
+def is_degenerate_element(bar_ecc_element):
+    '''returns True if two consecutive permutations of a basis element in the 
+    Barratt-Eccles operad agree'''
+
+    return any(bar_ecc_element[k] == bar_ecc_element[k+1] 
+               for k in range(len(bar_ecc_element)-1))
\ No newline at end of file
@@ -1,3 +1,12 @@
+from bisect import bisect_left
+from io import StringIO
+from functools import lru_cache
+from weakref import WeakValueDictionary
+from . import instrumentation
+
+# maximal number of pairs of operators whose composition is kept in memory
+COMPOSE_CACHE_SIZE = 2**16
+
 class Operator(object):
     '''
     Models a simplicial operator of the form:
@@ -16,12 +25,61 @@ class Operator(object):
     face_maps : tuple or list
                 An ordered collection of integers representing the face maps of the operator
 
+    Operators are immutable and compare equal when their canonical forms agree, 
+    so sets of them (or of tuples of them) model sums with coefficients in F_2.
+
     '''
 
+    __slots__ = ('deg_maps', 'face_maps', '_hash', '__weakref__')
+
+    # canonical representatives shared by equal operators, see Operator.intern
+    _interned = WeakValueDictionary()
+
     def __init__(self, deg_maps = [], face_maps = []):
 
-        self.deg_maps  = Operator.deg_maps_sort(deg_maps)
-        self.face_maps = Operator.face_maps_sort(face_maps)
+        deg_maps  = Operator.deg_maps_sort(deg_maps)
+        face_maps = Operator.face_maps_sort(face_maps)
+
+        object.__setattr__(self, 'deg_maps', deg_maps)
+        object.__setattr__(self, 'face_maps', face_maps)
+        object.__setattr__(self, '_hash', hash((deg_maps, face_maps)))
+
+        if instrumentation.enabled:
+            instrumentation.count('Operator.allocations')
+
+    def __setattr__(self, name, value):
+
+        raise AttributeError('Operator objects are immutable')
+
+    def __delattr__(self, name):
+
+        raise AttributeError('Operator objects are immutable')
+
+    def __eq__(self, other):
+
+        if not isinstance(other, Operator):
+            return NotImplemented
+
+        return (self is other or
+                (self._hash == other._hash and
+                 self.deg_maps == other.deg_maps and
+                 self.face_maps == other.face_maps))
+
+    def __ne__(self, other):
+
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+
+        return not equal
+
+    def __hash__(self):
+
+        return self._hash
+
+    def __reduce__(self):
+
+        return (Operator, (self.deg_maps, self.face_maps))
 
     def __repr__(self):
 
@@ -74,46 +132,70 @@ class Operator(object):
 
         return len(self.deg_maps) - len(self.face_maps)
 
-    @property
-    def is_degenerate(self):
-        '''returns True if the operator is degenerate and False if not'''
+    def compose(self, other):
+        '''returns the operator self other. Recent compositions are kept in a 
+        bounded cache, see Operator.compose_cache_info'''
 
-        return bool(self.deg_maps)
+        if instrumentation.enabled:
+            instrumentation.count('Operator.compose')
 
-    def compose(self, other):
-        '''returns the operator self other'''
+        return _compose(self, other)
 
-        s_left, d_left  = list(self.deg_maps), list(self.face_maps)
-        s_right, d_right = list(other.deg_maps), list(other.face_maps)
+    def compose_many(self, others):
+        '''returns the compositions self other for every other in an iterable, 
+        as a list, or as an F2Chain if a set of Operators is passed'''
 
-        # getting s_right passed d_left
-        d = d_left
-        s = []
-        for j in s_right:
-            if j+1 in d or j in d:
-                p = max(filter(lambda k: k == j or k == j+1, d))
-                d = d[:d.index(p)] + [k-1 for k in d[d.index(p)+1:]]
+        if isinstance(others, set):
+            answer = F2Chain()
+            answer.toggle_all(_compose(self, other) for other in others)
+            return answer
 
-            else:
-                lt = list(filter(lambda k: k < j, d))
-                gt = list(filter(lambda k: k > j+1, d))
-                d = lt + [k-1 for k in gt]
-                s.append(j - len(lt))
+        return [_compose(self, other) for other in others]
+
+    @staticmethod
+    def compose_cache_info():
+        '''returns the hit, miss and size statistics of the cache of compositions'''
+
+        return _compose.cache_info()
+
+    @staticmethod
+    def compose_cache_clear():
+        '''empties the cache of compositions'''
+
+        _compose.cache_clear()
+
+    @classmethod
+    def _canonical(cls, deg_maps, face_maps):
+        '''returns the operator with the passed tuples of maps, which must 
+        already be in canonical order'''
+
+        op = object.__new__(cls)
+        object.__setattr__(op, 'deg_maps', deg_maps)
+        object.__setattr__(op, 'face_maps', face_maps)
+        object.__setattr__(op, '_hash', hash((deg_maps, face_maps)))
 
-        # One can maybe optimize the following using that
-        # s_left, s, d, and d_right are totally ordered
+        if instrumentation.enabled:
+            instrumentation.count('Operator.allocations')
 
-        new_deg_maps  = Operator.deg_maps_sort(s_left + s)
-        new_face_maps = Operator.face_maps_sort(d + d_right)
+        return op
 
-        return Operator(new_deg_maps, new_face_maps)
+    def intern(self):
+        '''returns the canonical representative of the operator, so that equal 
+        operators created while it is alive share a single object'''
+
+        key = (self.deg_maps, self.face_maps)
+        try:
+            return Operator._interned[key]
+        except KeyError:
+            Operator._interned[key] = self
+            return self
 
     def prime(self):
         '''adds 1 to all the numbers defining the face and degeneracy maps 
         of the operator'''
         
-        return Operator((v+1 for v in self.deg_maps),
-                        (w+1 for w in self.face_maps))
+        return Operator._canonical(tuple(v+1 for v in self.deg_maps),
+                                   tuple(w+1 for w in self.face_maps))
     
     @staticmethod
     def deg_maps_sort(deg_maps):
@@ -161,7 +243,7 @@ class Operator(object):
     def is_degenerate(multiop):
         '''returns True if a multioperator is degenerate'''
         if isinstance(multiop, Operator):
-            return multiop.is_degenerate
+            return bool(multiop.deg_maps)
         if isinstance(multiop, tuple):
             deg = set(multiop[0].deg_maps)
             for op in multiop:
@@ -181,13 +263,6 @@ class Operator(object):
         if isinstance(multiop, Operator) and not isinstance(lincomb, set):
             return multiop(lincomb)
         
-        # single Operator and set of simplices
-        if isinstance(multiop, Operator) and isinstance(lincomb, set):
-            answer = set()
-            for spx in lincomb:
-                answer ^= {multiop(spx)}
-            return answer
-        
         # single multioperator and single multisimplex
         if isinstance(multiop, tuple) and not isinstance(lincomb, set):
             if len(multiop) == len(lincomb): 
@@ -195,26 +270,15 @@ class Operator(object):
             else:
                 raise TypeError('arities do not match')
         
-        # single multioperator and set of multisimplices
-        if isinstance(multiop, tuple) and isinstance(lincomb, set):
-            answer = set()
-            for spx in lincomb:
-                answer ^= {Operator.action(multiop, spx)}
-            return answer
+        # single Operator or multioperator and set of (multi)simplices
+        if isinstance(multiop, (Operator, tuple)):
+            return F2Chain((multiop,)).act_on(lincomb)
         
-        # set of Operators or multioperators and single spx or multisimplex
-        if isinstance(multiop, set) and not isinstance(lincomb, set):
-            try:
-                return Operator.action(multiop, {tuple(lincomb)})
-            except TypeError:
-                raise(TypeError('Cannot be acted on'))
-        
-        # set of Operators or multioperators and set of simplices or multisimplices
-        if isinstance(multiop, set) and isinstance(lincomb, set):
-            answer = set()
-            for mop in multiop:
-                answer ^= Operator.action(mop, lincomb)
-            return answer
+        # set of Operators or multioperators
+        if isinstance(multiop, set):
+            if not isinstance(multiop, F2Chain):
+                multiop = F2Chain(multiop)
+            return multiop.act_on(lincomb)
         
         else:
             raise TypeError('cannot act: must be Operator, '+
@@ -224,53 +288,321 @@ class Operator(object):
     def display(multiop):
         '''tool to aid visualization of operators'''
         
-        if isinstance(multiop, Operator):
-            return str(multiop)
-        
-        if isinstance(multiop, tuple):
-            string = ''
-            for op in multiop:
-                string += str(op) + ' x '
-            return string[:-3]
-        
-        if isinstance(multiop, set):
-            string = '  '
-            for op in multiop:
-                string += Operator.display(op) + '\n+ '
-            return string[:-3]
-        
-        else:
-            raise TypeError('Expected types: Operator, tuple of '+
-                            'Operator, or set of tuple of Operator')
+        file = StringIO()
+        Operator.write_display(multiop, file)
+
+        return file.getvalue()
             
     @staticmethod
     def display_action(multiop, lincomb):
         '''modeling the action of operators'''
-        string = str(Operator.action(multiop, lincomb))
-        
-        if '{((' in string:
-            string = string.replace(')), ((', ')\n+ (')
-            string = string.replace('{(', '  ')
-            string = string.replace(')}', '')
-            string = string.replace('),', ') x')
-            return string
-        
-        elif '((' in string:
-            string = string.replace('), (', ') x (')
-            string = string.replace('((', '  (')
-            string = string.replace('))', ')')
-            return string  
-                
-        elif '{(' in string:
-            string = string.replace('), (', ')\n+ (')
-            string = string.replace('{', '  ')
-            string = string.replace('}', '')
-            return string
-        
-        elif '(' in string:
-            return '  ' + string
+
+        file = StringIO()
+        Operator.write_action(multiop, lincomb, file)
+
+        return file.getvalue()
+
+    @staticmethod
+    def write_display(multiop, file, limit=None, summary=False):
+        '''writes the display of an Operator, a multioperator or a set of such
+        to a file-like object one term at a time. If limit is passed only the 
+        first limit terms are written, and if summary == True the number of 
+        terms and how many there are of each degree are written after them'''
+
+        if isinstance(multiop, (Operator, tuple)):
+            _write_terms((multiop,), file, _format_multiop, _multiop_degree, 
+                         '', limit, summary, 'degrees')
+
+        elif isinstance(multiop, (set, frozenset)):
+            _write_terms(multiop, file, _format_multiop, _multiop_degree, 
+                         '  ', limit, summary, 'degrees')
         
         else:
-            return '0'
-        
-    # TODO general composition
\ No newline at end of file
+            raise TypeError('Expected types: Operator, tuple of '+
+                            'Operator, or set of tuple of Operator')
+
+    @staticmethod
+    def write_action(multiop, lincomb, file, limit=None, summary=False):
+        '''writes the display of the action of operators to a file-like object 
+        one term at a time, see Operator.write_display'''
+
+        result = Operator.action(multiop, lincomb)
+        if not isinstance(result, (set, frozenset)):
+            result = (result,)
+
+        _write_terms(result, file, _format_multisimplex, _multisimplex_dimension, 
+                     '  ', limit, summary, 'dimensions', empty='0')
+
+
+@lru_cache(maxsize=COMPOSE_CACHE_SIZE)
+def _compose(left, right):
+    '''returns the operator left right, merging the canonical forms'''
+
+    if instrumentation.enabled:
+        instrumentation.count('Operator.compose.computed')
+
+    # getting the degeneracies of right passed the faces of left
+    s, d = _exchange(left.face_maps, right.deg_maps[::-1])
+
+    # s_left s = s' and d d_right = d' in canonical order
+    s_left = left.deg_maps[::-1]
+    deg_maps = _merge(s_left, _deposit(s, s_left))
+    face_maps = _merge(right.face_maps, _deposit(d, right.face_maps))
+
+    return Operator._canonical(deg_maps[::-1], face_maps)
+
+def _exchange(faces, degs):
+    '''returns increasing tuples s and d with d(faces) s(degs) = s d, for 
+    increasing tuples faces and degs. 
+
+    Viewing s(degs) as a monotone surjection g and d(faces) as a monotone 
+    injection f, the faces d are the targets not hit by gf and the 
+    degeneracies s are the positions i with gf(i) = gf(i+1)'''
+
+    face_set, deg_set = set(faces), set(degs)
+
+    # targets of the blocks g^{-1}(j) consisting only of faces
+    new_faces, end = [], -1
+    for f in faces:
+        if f <= end:
+            continue
+        start, end = f, f
+        while start-1 in deg_set:
+            start -= 1
+        while end in deg_set:
+            end += 1
+        if all(t in face_set for t in range(start, end+1)):
+            new_faces.append(start - bisect_left(degs, start))
+
+    # kept positions with the same image as the previous kept position
+    new_degs = []
+    for d in degs:
+        t = d+1
+        if t in face_set:
+            continue
+        u = d
+        while u in face_set and u in deg_set:
+            u -= 1
+        if u >= 0 and u not in face_set and u in deg_set:
+            new_degs.append(t - bisect_left(faces, t) - 1)
+
+    return tuple(new_degs), tuple(new_faces)
+
+def _deposit(values, occupied):
+    '''returns the increasing tuple whose k-th element is the values[k]-th 
+    integer not in the increasing tuple occupied'''
+
+    answer, k = [], 0
+    for v in values:
+        v += k
+        while k < len(occupied) and occupied[k] <= v:
+            k += 1
+            v += 1
+        answer.append(v)
+
+    return tuple(answer)
+
+def _merge(a, b):
+    '''returns the increasing merge of two disjoint increasing tuples'''
+
+    answer, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            answer.append(a[i])
+            i += 1
+        else:
+            answer.append(b[j])
+            j += 1
+
+    return tuple(answer) + a[i:] + b[j:]
+
+
+def _write_terms(terms, file, format, degree, prefix, limit, summary, label, 
+                 empty=''):
+    '''writes a sum of terms to a file-like object, or empty if there are none,
+    returning their number'''
+
+    if not terms:
+        file.write(empty)
+
+    degrees = {}
+    for k, term in enumerate(terms):
+        if limit is None or k < limit:
+            file.write((prefix if k == 0 else '\n+ ') + format(term))
+        elif not summary:
+            break
+        if summary:
+            key = degree(term)
+            degrees[key] = degrees.get(key, 0) + 1
+
+    if limit is not None and len(terms) > limit:
+        file.write((prefix if limit == 0 else '\n+ ') + 
+                   '... %d more terms' % (len(terms) - limit))
+
+    if summary:
+        file.write('\n\n%d terms\n%s: ' % (len(terms), label) + 
+                   ', '.join(f'{key}: {k}' for key, k in sorted(degrees.items())))
+
+    return len(terms)
+
+def _format_multiop(multiop):
+
+    if isinstance(multiop, tuple):
+        return ' x '.join(str(op) for op in multiop)
+
+    return str(multiop)
+
+def _multiop_degree(multiop):
+
+    if isinstance(multiop, tuple):
+        return tuple(op.degree for op in multiop)
+
+    return multiop.degree
+
+def _format_multisimplex(multispx):
+
+    if multispx and isinstance(multispx[0], tuple):
+        return ' x '.join(str(spx) for spx in multispx)
+
+    return str(multispx)
+
+def _multisimplex_dimension(multispx):
+
+    if multispx and isinstance(multispx[0], tuple):
+        return tuple(len(spx)-1 for spx in multispx)
+
+    return len(multispx)-1
+
+
+class F2Chain(set):
+    '''
+    Models a linear combination with coefficients in F_2 of Operators,
+    multioperators, simplices or multisimplices, represented by the set 
+    of its terms with coefficient 1.
+
+    Addition is modeled by the symmetric difference ^ and its in place 
+    version ^=, single terms are added with toggle. A chain constructed from 
+    an iterable is the sum of its terms, so repeated terms cancel in pairs.
+
+    '''
+
+    __slots__ = ()
+
+    def __init__(self, terms=()):
+
+        if isinstance(terms, (set, frozenset)):
+            set.__init__(self, terms)
+        else:
+            set.__init__(self)
+            self.toggle_all(terms)
+
+    def __xor__(self, other):
+
+        if not isinstance(other, (set, frozenset)):
+            return NotImplemented
+
+        return F2Chain(set.__xor__(self, other))
+
+    __rxor__ = __xor__
+
+    def copy(self):
+
+        return F2Chain(self)
+
+    def toggle(self, term):
+        '''adds a single term to the chain'''
+
+        try:
+            self.remove(term)
+        except KeyError:
+            self.add(term)
+
+    def toggle_all(self, terms):
+        '''adds every term of an iterable to the chain, repeated terms
+        cancelling in pairs'''
+
+        if instrumentation.enabled:
+            size, k = len(self), 0
+            for k, term in enumerate(terms, 1):
+                try:
+                    self.remove(term)
+                except KeyError:
+                    self.add(term)
+            instrumentation.count('F2Chain.terms', k)
+            instrumentation.count('F2Chain.cancellations', (size + k - len(self)) // 2)
+            return
+
+        for term in terms:
+            try:
+                self.remove(term)
+            except KeyError:
+                self.add(term)
+
+    @staticmethod
+    def sum(chains):
+        '''returns the sum of an iterable of sets of terms'''
+
+        answer = F2Chain()
+        for chain in chains:
+            answer ^= chain
+
+        return answer
+
+    @property
+    def arity(self):
+        '''returns the number of factors of the terms as an int, 
+        or None if the chain is zero'''
+
+        for term in self:
+            if (isinstance(term, tuple) and term and
+                    not isinstance(term[0], int)):
+                return len(term)
+            return 1
+
+    @property
+    def degree(self):
+        '''returns the degree of a homogeneous chain of Operators or 
+        multioperators as an int, or None if the chain is zero'''
+
+        degrees = set()
+        for term in self:
+            if isinstance(term, Operator):
+                degrees.add(term.degree)
+            else:
+                degrees.add(sum(op.degree for op in term))
+
+        if len(degrees) > 1:
+            raise ValueError('the chain is not homogeneous')
+
+        return degrees.pop() if degrees else None
+
+    def act_on(self, lincomb):
+        '''returns the action of a chain of Operators or multioperators 
+        on a (multi)simplex or a set of such'''
+
+        if not isinstance(lincomb, (set, frozenset)):
+            lincomb = (lincomb,)
+
+        answer = F2Chain()
+        first = next(iter(self), None)
+
+        if first is None:
+            return answer
+
+        if isinstance(first, Operator):
+            for op in self:
+                for spx in lincomb:
+                    answer.toggle(op(spx))
+            return answer
+
+        if isinstance(first, tuple):
+            for multiop in self:
+                for multispx in lincomb:
+                    if len(multiop) != len(multispx):
+                        raise TypeError('arities do not match')
+                    answer.toggle(tuple(op(spx) for op, spx 
+                                        in zip(multiop, multispx)))
+            return answer
+
+        raise TypeError('cannot act: must be Operator, '+
+                        'tuple of them, or a set of such tuples')
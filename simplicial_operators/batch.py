@@ -0,0 +1,177 @@
+'''
+Resumable batch computation of the constructions of simplicial_operators.
+
+A job manifest is a JSON file of the form
+
+    {"output": "results",
+     "jobs": [{"construction": "shih", "grid": {"n": [8, 9, 10]}},
+              {"construction": "cartan_operator", "grid": {"i": [2, 3], "n": [10, 11]}}]}
+
+where each job computes a construction for every combination of the values
+of its keyword arguments in the grid, JSON lists being passed as tuples. 
+Each result is written to the output directory in the format of the module 
+serialization as soon as it is computed, in a file named after the 
+construction and its arguments, or one per key if it is a dictionary of 
+tables, and recorded in the file checkpoint.json there. An interrupted run 
+resumes from the checkpoint, and the tables of lower degrees computed 
+recursively are kept in an on-disk store in the output directory, see the 
+module store, so they are not recomputed either. Progress and throughput are reported on
+stderr.
+
+Usage:
+
+    simplicial-operators-batch MANIFEST [--output DIR] [--max-workers W] [--restart]
+'''
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import product
+from . import serialization, store
+from .aw_ez_shih import shih, eilenberg_zilber
+from .steenrod import steenrod_diagonal
+from .surjections import surjection_operator
+from .cartan import cartan_operator
+
+CONSTRUCTIONS = {'shih': shih,
+                 'eilenberg_zilber': eilenberg_zilber,
+                 'steenrod_diagonal': steenrod_diagonal,
+                 'surjection_operator': surjection_operator,
+                 'cartan_operator': cartan_operator}
+
+CHECKPOINT = 'checkpoint.json'
+
+def tasks(manifest):
+    '''returns the list of pairs (construction, keyword arguments) of the
+    jobs in a manifest, in order'''
+
+    answer = []
+    for job in manifest['jobs']:
+        name = job['construction']
+        if name not in CONSTRUCTIONS:
+            raise ValueError(f'unknown construction {name}')
+        grid = job.get('grid', {})
+        for values in product(*grid.values()):
+            answer.append((name, dict(zip(grid, values))))
+
+    return answer
+
+def filename(name, kwargs):
+    '''returns the name of the file storing the result of a task'''
+
+    arguments = ','.join(f'{key}={_compact(value)}' for key, value in kwargs.items())
+
+    return f'{name}[{arguments}].sops'
+
+def run(manifest, output=None, max_workers=None, restart=False, log=sys.stderr):
+    '''computes the tasks of a manifest not recorded in the checkpoint of the
+    output directory, writing each result and updating the checkpoint as soon
+    as it is computed. It returns the number of tasks computed'''
+
+    output = output or manifest.get('output', '.')
+    os.makedirs(output, exist_ok=True)
+    # the store of the output directory is only used during the run
+    directory = store.get_directory()
+    if directory is None:
+        store.set_directory(os.path.join(output, 'store'))
+    try:
+        checkpoint = os.path.join(output, CHECKPOINT)
+        done = set()
+        if not restart and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                done = set(json.load(file)['done'])
+
+        pending = [(name, kwargs) for name, kwargs in tasks(manifest)
+                   if filename(name, kwargs) not in done]
+        total = len(done) + len(pending)
+        if not pending:
+            print(f'all {total} tasks already computed in {output}', file=log, 
+                  flush=True)
+
+        start, terms = time.perf_counter(), 0
+        for k, (name, kwargs) in enumerate(pending, 1):
+            task_start = time.perf_counter()
+            arguments = {key: _tuples(value) for key, value in kwargs.items()}
+            if name == 'cartan_operator' and max_workers is not None:
+                arguments['max_workers'] = max_workers
+            result = CONSTRUCTIONS[name](**arguments)
+
+            # dictionaries of tables are written one table per key
+            if not isinstance(result, dict):
+                result = {None: result}
+            for key, value in result.items():
+                path = filename(name, kwargs if key is None else dict(kwargs, key=key))
+                _write(os.path.join(output, path), serialization.dumps(value))
+            size = sum(len(value) for value in result.values())
+
+            done.add(filename(name, kwargs))
+            _write(checkpoint, json.dumps({'done': sorted(done)}, indent=1).encode())
+
+            now = time.perf_counter()
+            terms += size
+            print(f'[{len(done)}/{total}] {filename(name, kwargs)}: {size} terms '
+                  f'in {now - task_start:.2f}s, {terms / (now - start):.0f} terms/s, '
+                  f'{_eta(now - start, k, len(pending))} left', file=log, flush=True)
+    finally:
+        store.set_directory(directory)
+
+    return len(pending)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('manifest', help='JSON file describing the jobs')
+    parser.add_argument('--output', help='directory of the results, overriding '+
+                        'the one in the manifest')
+    parser.add_argument('--max-workers', type=int,
+                        help='processes used by cartan_operator')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the checkpoint and recompute every task')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as file:
+        manifest = json.load(file)
+
+    run(manifest, args.output, args.max_workers, args.restart)
+
+    return 0
+
+def _compact(value):
+
+    if isinstance(value, (list, tuple)):
+        return '(' + ','.join(_compact(v) for v in value) + ')'
+
+    return str(value).replace(' ', '')
+
+def _tuples(value):
+    '''returns a JSON value with its lists turned into tuples'''
+
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+
+    return value
+
+def _write(path, data):
+    '''writes bytes to a file atomically'''
+
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+def _eta(elapsed, k, total):
+
+    seconds = round(elapsed / k * (total - k))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+'''
+Boundary of maps of normalized chains defined by sums of multioperators, and
+verification of the identities satisfied by the constructions of the package.
+
+A set of multioperators with r factors defined on n-simplices represents the
+map sending an n-simplex x to the sum of the tensor products of the simplices
+op(x) over its factors op. Its target is either the r-fold tensor product of
+normalized chains, with the tensor boundary, or the normalized chains of the
+r-fold product, with the product boundary. All computations are symbolic:
+faces are composed with the operators and terms zero in normalized chains
+are dropped.
+'''
+
+from .base_class import Operator, F2Chain
+from .aw_ez_shih import shih, _ezaw
+from .steenrod import steenrod_diagonal
+from .barratt_eccles import barratt_eccles_operator, is_degenerate_element
+from .operads import barratt_eccles_composition
+from .cartan import (cartan_first_homotopy, cartan_second_homotopy, 
+                     cartan_operator, CartanPipeline)
+
+def output_boundary(multiops, n, product=False):
+    '''returns the multioperators defining the composition of the map defined
+    by multiops on n-simplices with the boundary of its target, the tensor
+    boundary or, if product == True, the product boundary'''
+
+    answer = F2Chain()
+    for multiop in _as_multiops(multiops):
+        if product:
+            m = n + multiop[0].degree
+            answer.toggle_all(tuple(_face(k).compose(op) for op in multiop)
+                              for k in _faces(m))
+        else:
+            for j, op in enumerate(multiop):
+                answer.toggle_all(multiop[:j] + (_face(k).compose(op),) + multiop[j+1:]
+                                  for k in _faces(n + op.degree))
+
+    return _normalized(answer, product)
+
+def input_boundary(multiops, n, product=False):
+    '''returns the multioperators on n-simplices defining the composition of
+    the boundary of n-simplices with the map defined by multiops on
+    (n-1)-simplices'''
+
+    answer = F2Chain()
+    for k in _faces(n):
+        d_k = _face(k)
+        answer.toggle_all(tuple(op.compose(d_k) for op in multiop)
+                          for multiop in _as_multiops(multiops))
+
+    return _normalized(answer, product)
+
+def boundary(multiops, lower_multiops, n, product=False):
+    '''returns the multioperators on n-simplices defining the boundary
+    d f + f d of the map f defined by multiops on n-simplices and by
+    lower_multiops on (n-1)-simplices'''
+
+    return (output_boundary(multiops, n, product) ^
+            input_boundary(lower_multiops, n, product))
+
+def verify_shih(n, table=shih):
+    '''checks the identity d H + H d = EZ AW + id of maps from normalized
+    chains of X to those of X x X in every degree up to n, for the
+    homotopy H whose bioperators in degree m are table(m). It returns
+    None if it holds and otherwise the first degree where it fails'''
+
+    lower = F2Chain()
+    for m in range(n+1):
+        upper = F2Chain(table(m))
+        expected = _normalized(_ezaw(m) ^ {(Operator(), Operator())}, True)
+        if boundary(upper, lower, m, product=True) != expected:
+            return m
+        lower = upper
+
+    return None
+
+def verify_steenrod(i, n, table=steenrod_diagonal):
+    '''checks the identity d D_j + D_j d = D_{j-1} + T D_{j-1} of maps from
+    normalized chains to their tensor square for every j up to i and degree
+    up to n, where T is the transposition of factors and the cup-j coproduct
+    on m-simplices is defined by table(j, m). It returns None if it holds
+    and otherwise the first bidegree (j, m) where it fails'''
+
+    for m in range(n+1):
+        previous = F2Chain()
+        for j in range(i+1):
+            upper = F2Chain(table(j, m))
+            lower = F2Chain(table(j, m-1)) if m > 0 else F2Chain()
+            expected = _normalized(previous ^ {(op1, op0) for op0, op1 in previous},
+                                   False)
+            if boundary(upper, lower, m) != expected:
+                return j, m
+            previous = upper
+
+    return None
+
+def verify_cartan(i, n, table=cartan_operator):
+    '''checks the cartan coboundaries for every j up to i and degree up to n.
+    The sum C_j of the Barratt-Eccles elements given by the two homotopies 
+    must satisfy 
+
+        d C_j = (23) (x_j o (e, e)) + sum_{k=0}^j e o (x_k, x_{j-k})
+
+    with x_j = (e, (12), ..., (12)^j), up to the action of the permutations of
+    the inputs fixing (a, a, b, b), which acts trivially on the cochains the 
+    coboundary is applied to. The multioperators table(j, m) must then be 
+    those defined by C_j on m-simplices. It returns None if both hold and 
+    otherwise the first bidegree (j, m) where they fail, m being None if the 
+    identity of the elements fails'''
+
+    e = ((1,2),)
+    for j in range(i+1):
+        elements = cartan_first_homotopy(j) ^ cartan_second_homotopy(j)
+        expected = _relabeled(barratt_eccles_composition(_x(j), [e, e]), (1,3,2,4))
+        for k in range(j+1):
+            expected ^= barratt_eccles_composition(e, [_x(k), _x(j-k)])
+        if (_coinvariants(_barratt_eccles_boundary(elements)) != 
+            _coinvariants(expected)):
+            return j, None
+
+        for m in range(n+1):
+            multiops = barratt_eccles_operator(elements, m, CartanPipeline.equal_degrees,
+                                               nondegenerate=True)
+            if F2Chain(table(j, m)) != multiops:
+                return j, m
+
+    return None
+
+def _face(k):
+    '''returns the face map d_k'''
+
+    return Operator._canonical((), (k,)).intern()
+
+def _faces(n):
+    '''returns the indices of the faces of an n-simplex in the boundary, 
+    which is zero in degree 0'''
+
+    return range(n+1) if n > 0 else range(0)
+
+def _as_multiops(multiops):
+
+    if isinstance(multiops, (Operator, tuple)):
+        multiops = {multiops}
+
+    return [(multiop,) if isinstance(multiop, Operator) else multiop
+            for multiop in multiops]
+
+def _normalized(multiops, product=False):
+    '''returns the multioperators not zero in normalized chains, those with no
+    degenerate factor, or with no common degeneracy if product == True'''
+
+    if product:
+        return F2Chain(multiop for multiop in multiops
+                       if not Operator.is_degenerate(multiop))
+
+    return F2Chain(multiop for multiop in multiops
+                   if not any(op.deg_maps for op in multiop))
+
+def _x(j):
+    '''returns the Barratt-Eccles element (e, (12), ..., (12)^j)'''
+
+    return tuple(((1,2), (2,1))[k % 2] for k in range(j+1))
+
+def _barratt_eccles_boundary(elements):
+    '''returns the boundary of a sum of Barratt-Eccles basis elements, the
+    sum of their faces removing one permutation, the degenerate ones being 
+    zero'''
+
+    answer = F2Chain()
+    for element in elements:
+        if len(element) > 1:
+            answer.toggle_all(face for face in (element[:k] + element[k+1:]
+                                                for k in range(len(element)))
+                              if not is_degenerate_element(face))
+
+    return answer
+
+def _relabeled(elements, sigma):
+    '''returns the sum of Barratt-Eccles elements with the input v of each
+    permutation relabeled sigma[v-1]'''
+
+    return F2Chain(tuple(tuple(sigma[v-1] for v in p) for p in element)
+                   for element in elements)
+
+def _coinvariants(elements):
+    '''returns the sum of the least representatives of the orbits of arity 4
+    Barratt-Eccles elements under the relabelings fixing (a, a, b, b)'''
+
+    group = ((1,2,3,4), (2,1,3,4), (1,2,4,3), (2,1,4,3))
+
+    return F2Chain(min(tuple(tuple(sigma[v-1] for v in p) for p in element)
+                       for sigma in group)
+                   for element in elements)
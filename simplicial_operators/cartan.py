@@ -1,6 +1,14 @@
-from .base_class import Operator
-from .aw_ez_shih import shih
-from .barratt_eccles import barratt_eccles_operator
+from collections import OrderedDict
+from .base_class import F2Chain
+from .aw_ez_shih import iter_shih
+from .barratt_eccles import table_reduction
+from .operads import permutation_composition
+from .surjections import surjection_operator, parallel_surjection_operator
+from . import instrumentation, store
+
+# maximal number of values of i, and of pairs (i, n), whose stages are kept 
+# in memory by a CartanPipeline
+CARTAN_CACHE_SIZE = 32
 
 def cartan_first_homotopy(n):
     '''applies the first homotopy to the element 
@@ -20,9 +28,9 @@ def cartan_first_homotopy(n):
     x = tuple(a[i%2] for i in range(n+1))
     y = tuple(b[i%2] for i in range(n+1))
 
-    answer = set()
+    answer = F2Chain()
     for i in range(n+1):
-        answer ^= {x[:i+1]+y[i:]}
+        answer.toggle(x[:i+1]+y[i:])
 
     return answer
 
@@ -38,44 +46,156 @@ def cartan_second_homotopy(n):
     x = [sigma_two[i%2] for i in range(n+1)]
 
     if n == 0:
-        return set()
+        return F2Chain()
 
-    # composition (e, x, y) with x,y in sigma_two
-    composition = {((1,2), (2,1)) : (1,2,4,3),
-                   ((2,1), (1,2)) : (2,1,3,4),
-                   ((2,1), (2,1)) : (2,1,4,3),
-                   ((1,2), (1,2)) : (1,2,3,4)}
-
-    values = set()
-    for biop in shih(n):
-        if not Operator.is_degenerate(biop):
-            values ^= {(biop[0](x), biop[1](x))}
+    values = F2Chain()
+    for biop in iter_shih(n, nondegenerate=True):
+        values.toggle((biop[0](x), biop[1](x)))
 
-    answer = set()
+    # composition (e, x, y) with x,y in sigma_two
+    answer = F2Chain()
     for value in values:
-
-        table = tuple()
-        for i in range(n+2):
-            table += tuple((composition[(value[0][i], value[1][i])],))
-
-        answer ^= {table}
+        answer.toggle(tuple(permutation_composition((1,2), pair) 
+                            for pair in zip(*value)))
 
     return answer
 
-def cartan_operator(i, n):
+def cartan_operator(i, n, max_workers=None):
     '''
     it returns the multioperators defining the i-th cartan coboundary in degree n when 
-    applied to homogeneous cocycles
+    applied to homogeneous cocycles. If max_workers is passed the computation is 
+    distributed across a pool with that many processes. Intermediate and final 
+    results are kept by a module level CartanPipeline, see cache_clear, and the 
+    multioperators in the on-disk store if one is set, see the module store
     '''
-    if i >= n:
-        return set()
-    
-    first  = cartan_first_homotopy(i)
-    second = cartan_second_homotopy(i)
-    all_operators = barratt_eccles_operator(first^second, n)
-    
-    filtered_by_degree = {multiop for multiop in all_operators if 
-                          multiop[0].degree == multiop[1].degree and 
-                          multiop[2].degree == multiop[3].degree}
-    
-    return filtered_by_degree
\ No newline at end of file
+    return _pipeline.operator(i, n, max_workers)
+
+def cache_clear():
+    '''empties the stages kept by cartan_operator'''
+
+    _pipeline.clear()
+
+class CartanPipeline(object):
+    '''
+    Staged computation of the multioperators defining the cartan coboundaries.
+
+    The Barratt-Eccles elements given by the homotopies and the surjections in 
+    their image under the table reduction only depend on i, so they are computed 
+    once per i. The multioperators only depend on (i, n) and are computed once, 
+    keeping only those whose first two and last two factors have equal degrees 
+    during the enumeration. The stages of the CARTAN_CACHE_SIZE most recently 
+    used values of i and pairs (i, n) are kept in memory, older tables being 
+    reloaded from the on-disk store if one is set.
+
+    Parameters
+    ----------
+    max_workers : int or None
+                  If not None, number of processes used to compute the multioperators
+
+    '''
+
+    # pairs of factors with the same degree in a cartan coboundary
+    equal_degrees = ((0,1), (2,3))
+
+    def __init__(self, max_workers=None):
+
+        self.max_workers = max_workers
+        self._elements = _Stage(CARTAN_CACHE_SIZE)
+        self._surjections = _Stage(CARTAN_CACHE_SIZE)
+        self._operators = _Stage(CARTAN_CACHE_SIZE)
+        # largest degree computed for each i
+        self._degrees = {}
+
+    def elements(self, i):
+        '''returns the Barratt-Eccles elements given by the first and second 
+        homotopies'''
+
+        if i not in self._elements:
+            with instrumentation.timer('cartan.elements'):
+                self._elements[i] = cartan_first_homotopy(i) ^ cartan_second_homotopy(i)
+
+        return F2Chain(self._elements[i])
+
+    def surjections(self, i):
+        '''returns the surjections in the image of the elements under the 
+        table reduction'''
+
+        if i not in self._surjections:
+            elements = self.elements(i)
+            with instrumentation.timer('cartan.surjections'):
+                self._surjections[i] = table_reduction(elements)
+
+        return F2Chain(self._surjections[i])
+
+    def operator(self, i, n, max_workers=None):
+        '''returns the multioperators defining the i-th cartan coboundary in 
+        degree n'''
+
+        if i >= n:
+            return F2Chain()
+
+        self._degrees[i] = max(n, self._degrees.get(i, n))
+        if (i,n) not in self._operators:
+            stored = store.load('cartan_operator', (i, n))
+            if stored is not None:
+                self._operators[(i,n)] = F2Chain(stored)
+                return F2Chain(stored)
+
+            surjections = self.surjections(i)
+            max_workers = max_workers or self.max_workers
+            with instrumentation.timer('cartan.operator[%d,%d]' % (i, n)):
+                if max_workers is None:
+                    answer = surjection_operator(surjections, n, self.equal_degrees,
+                                                 nondegenerate=True)
+                else:
+                    answer = parallel_surjection_operator(surjections, n, 
+                                                          self.equal_degrees,
+                                                          nondegenerate=True,
+                                                          max_workers=max_workers)
+            self._operators[(i,n)] = answer
+            store.save('cartan_operator', (i, n), answer)
+
+        return F2Chain(self._operators[(i,n)])
+
+    def next_degree(self, i):
+        '''computes the multioperators for the degree following the largest one 
+        computed so far for i and returns that degree together with them. Only 
+        the elements and surjections depending on i are reused, the search for 
+        the multioperators in the new degree starting from scratch, as it does 
+        not build on the multioperators of lower degrees'''
+
+        n = self._degrees.get(i, i) + 1
+
+        return n, self.operator(i, n)
+
+    def clear(self):
+        '''empties all stages'''
+
+        self._elements.clear()
+        self._surjections.clear()
+        self._operators.clear()
+        self._degrees.clear()
+
+class _Stage(OrderedDict):
+    '''dictionary keeping only its maxsize most recently used entries'''
+
+    def __init__(self, maxsize):
+
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+_pipeline = CartanPipeline()
\ No newline at end of file
@@ -0,0 +1,267 @@
+'''
+Exact counts, ranks and slices of the combinatorial families enumerated by the
+constructions of the package.
+
+Each family is listed in the order of the corresponding generator:
+
+    combinations        : itertools.combinations(range(n), k)
+    compositions        : _utils.compositions(n, k, smallest_value, largest_value)
+    harmonic partitions : _utils.harmonic_partitions(n, k, smallest_value)
+    shuffles            : _utils.shuffles(p, q)
+
+For each one count_* returns its size, rank_* the index of an element,
+unrank_* the element with a given index, and iter_* the elements with indices
+in range(start, stop), so that disjoint slices of a single enumeration can be
+handed to different workers. The constructions accept such slices through
+their index_range keyword, a pair (start, stop) interpreted as a slice.
+'''
+
+from functools import lru_cache
+from math import comb
+
+def count_combinations(n, k):
+    '''returns the number of k-combinations of range(n)'''
+
+    return comb(n, k) if k >= 0 else 0
+
+def rank_combination(combination, n):
+    '''returns the index of an increasing tuple among the combinations of
+    range(n) of its length'''
+
+    return _rank(combination, _combinations(n, len(combination)))
+
+def unrank_combination(rank, n, k):
+    '''returns the k-combination of range(n) with the passed index'''
+
+    return _unrank(rank, _combinations(n, k))
+
+def iter_combinations(n, k, start=0, stop=None):
+    '''returns a generator of the k-combinations of range(n) with indices
+    in range(start, stop)'''
+
+    return _iter(_combinations(n, k), start, stop)
+
+def count_compositions(n, k, smallest_value=1, largest_value=None):
+    '''returns the number of k tuples of integers between smallest_value and
+    largest_value adding to n'''
+
+    return _compositions(n, k, smallest_value, largest_value).size
+
+def rank_composition(composition, smallest_value=1, largest_value=None):
+    '''returns the index of a tuple among the compositions of its sum of its
+    length'''
+
+    family = _compositions(sum(composition), len(composition),
+                           smallest_value, largest_value)
+
+    return _rank(composition, family)
+
+def unrank_composition(rank, n, k, smallest_value=1, largest_value=None):
+    '''returns the composition of n of length k with the passed index'''
+
+    return _unrank(rank, _compositions(n, k, smallest_value, largest_value))
+
+def iter_compositions(n, k, smallest_value=1, largest_value=None, start=0, stop=None):
+    '''returns a generator of the compositions of n of length k with indices
+    in range(start, stop)'''
+
+    return _iter(_compositions(n, k, smallest_value, largest_value), start, stop)
+
+def count_harmonic_partitions(n, k, smallest_value=1):
+    '''returns the number of tuples (a_k, ..., a_1) of integers greater than or
+    equal to smallest_value such that a_1 + 2a_2 + ... + ka_k = n'''
+
+    return _harmonic_partitions(n, k, smallest_value).size
+
+def rank_harmonic_partition(partition, n, smallest_value=1):
+    '''returns the index of a tuple among the harmonic partitions of n of
+    its length'''
+
+    return _rank(partition, _harmonic_partitions(n, len(partition), smallest_value))
+
+def unrank_harmonic_partition(rank, n, k, smallest_value=1):
+    '''returns the harmonic partition of n of length k with the passed index'''
+
+    return _unrank(rank, _harmonic_partitions(n, k, smallest_value))
+
+def iter_harmonic_partitions(n, k, smallest_value=1, start=0, stop=None):
+    '''returns a generator of the harmonic partitions of n of length k with
+    indices in range(start, stop)'''
+
+    return _iter(_harmonic_partitions(n, k, smallest_value), start, stop)
+
+def count_shuffles(p, q):
+    '''returns the number of (p,q)-shuffles'''
+
+    return comb(p+q, p)
+
+def rank_shuffle(shuffle):
+    '''returns the index of a shuffle (mu, nu) among the (p,q)-shuffles'''
+
+    mu, nu = shuffle
+
+    return rank_combination(mu, len(mu)+len(nu))
+
+def unrank_shuffle(rank, p, q):
+    '''returns the (p,q)-shuffle with the passed index'''
+
+    mu = unrank_combination(rank, p+q, p)
+
+    return mu, _complement(mu, p+q)
+
+def iter_shuffles(p, q, start=0, stop=None):
+    '''returns a generator of the (p,q)-shuffles with indices in range(start, stop)'''
+
+    return ((mu, _complement(mu, p+q)) for mu in iter_combinations(p+q, p, start, stop))
+
+def bounds(index_range, size):
+    '''returns the pair (start, stop) of indices of a family of the passed size
+    selected by an index_range, None selecting all of them'''
+
+    if index_range is None:
+        return 0, size
+
+    start, stop, _ = slice(*index_range).indices(size)
+
+    return start, max(start, stop)
+
+class _Family(object):
+    '''
+    Tuples of length k built from left to right. The j-th entry is taken from
+    values(j, state), where state describes the entries before it and is
+    updated by step(state, value), and count(j, state) is the number of ways
+    of completing it, so a tuple belongs to the family when count(k, state)
+    is 1 after its last entry.
+    '''
+
+    def __init__(self, k, state, values, step, count):
+
+        self.k, self.state = k, state
+        self.values, self.step, self.count = values, step, count
+        self.size = count(0, state) if k >= 0 else 0
+
+def _combinations(n, k):
+
+    return _Family(k, 0,
+                   lambda j, low: range(low, n-(k-j)+1),
+                   lambda low, v: v+1,
+                   lambda j, low: comb(n-low, k-j))
+
+def _compositions(n, k, smallest_value=1, largest_value=None):
+
+    l, m = smallest_value, n if largest_value is None else largest_value
+
+    return _Family(k, n,
+                   lambda j, rest: range(l, m+1),
+                   lambda rest, v: rest-v,
+                   lambda j, rest: _count_compositions(rest, k-j, l, m))
+
+def _harmonic_partitions(n, k, smallest_value=1):
+
+    l = smallest_value
+
+    # the state is the pair (position, remainder)
+    return _Family(k, (0, n),
+                   lambda j, state: range(l, state[1]//(k-j)+1),
+                   lambda state, v: (state[0]+1, state[1] - (k-state[0])*v),
+                   lambda j, state: _count_harmonic_partitions(state[1], k-j, l))
+
+@lru_cache(maxsize=None)
+def _count_compositions(n, k, l, m):
+
+    if k == 0:
+        return int(n == 0)
+    if n < 0:
+        return 0
+
+    return sum(_count_compositions(n-v, k-1, l, m) for v in range(l, min(m, n)+1))
+
+@lru_cache(maxsize=None)
+def _count_harmonic_partitions(n, k, l):
+
+    if k == 0:
+        return int(n == 0)
+    if n < 0:
+        return 0
+
+    return sum(_count_harmonic_partitions(n-k*v, k-1, l) for v in range(l, n//k+1))
+
+def _rank(element, family):
+    '''returns the index of a tuple in a family'''
+
+    if len(element) != family.k:
+        raise ValueError('the tuple does not belong to the family')
+
+    answer, state = 0, family.state
+    for j, a in enumerate(element):
+        values = family.values(j, state)
+        if a not in values:
+            raise ValueError('the tuple does not belong to the family')
+        for v in range(values.start, a):
+            answer += family.count(j+1, family.step(state, v))
+        state = family.step(state, a)
+
+    if family.count(family.k, state) != 1:
+        raise ValueError('the tuple does not belong to the family')
+
+    return answer
+
+def _unrank(rank, family):
+    '''returns the tuple of a family with the passed index'''
+
+    if not 0 <= rank < family.size:
+        raise IndexError('index out of range')
+
+    answer, state = [], family.state
+    for j in range(family.k):
+        for v in family.values(j, state):
+            count = family.count(j+1, family.step(state, v))
+            if rank < count:
+                break
+            rank -= count
+        answer.append(v)
+        state = family.step(state, v)
+
+    return tuple(answer)
+
+def _iter(family, start=0, stop=None):
+    '''returns a generator of the tuples of a family with indices in
+    range(start, stop), the first one unranked and each of the following
+    obtained from the previous one'''
+
+    start, stop = bounds((start, stop), family.size)
+    if start == stop:
+        return
+
+    k = family.k
+    parts = list(_unrank(start, family))
+    states = [family.state]
+    for j in range(k):
+        states.append(family.step(states[j], parts[j]))
+
+    yield tuple(parts)
+    for _ in range(stop-start-1):
+        # rightmost entry that can grow, the entries after it being the least
+        j = k-1
+        while True:
+            following = (v for v in range(parts[j]+1, family.values(j, states[j]).stop)
+                         if family.count(j+1, family.step(states[j], v)))
+            v = next(following, None)
+            if v is not None:
+                break
+            j -= 1
+        parts[j], states[j+1] = v, family.step(states[j], v)
+
+        for i in range(j+1, k):
+            parts[i] = next(v for v in family.values(i, states[i])
+                            if family.count(i+1, family.step(states[i], v)))
+            states[i+1] = family.step(states[i], parts[i])
+
+        yield tuple(parts)
+
+def _complement(vertices, n):
+    '''returns the increasing tuple of elements of range(n) not in vertices'''
+
+    vertices = set(vertices)
+
+    return tuple(i for i in range(n) if i not in vertices)
@@ -0,0 +1,283 @@
+'''
+Action of operators on simplicial complexes and simplicial sets whose
+simplices of a given dimension n are stored as the rows of an integer
+NumPy array of shape (N, n+1).
+'''
+
+import numpy as np
+from .base_class import Operator
+from .packed import pack_many, indices_many
+from .steenrod import steenrod_diagonal
+
+def array_action(multiop, simplices, reduce=True):
+    '''returns the action of an Operator, a multioperator or a set of such on
+    every simplex in an integer array of shape (N, n+1), or on a single simplex.
+
+    The answer is a dictionary whose keys are the tuples of dimensions of the
+    factors and whose values are arrays with a row for each resulting
+    multisimplex, given by the concatenation of the vertices of its factors.
+    If reduce == True the rows are added mod 2, so they are sorted and
+    appear at most once.'''
+
+    simplices = np.asarray(simplices)
+    if simplices.ndim == 1:
+        simplices = simplices[None, :]
+    n = simplices.shape[1]-1
+
+    answer = {}
+    for dims, idx in vertex_indices(multiop, n).items():
+        rows = simplices[:, idx].reshape(-1, idx.shape[-1])
+        answer[dims] = reduce_mod_2(rows) if reduce else rows
+
+    return answer
+
+def steenrod_square(k, cochains, faces, simplices, format=None):
+    '''returns the values of Sq^k of mod 2 cochains on an array of simplices.
+
+    The d-cochains take values on the d-simplices listed in faces, an integer 
+    array of shape (N_d, d+1) containing every face of the simplices in the 
+    array of shape (N, d+k+1). By default they are the rows of an array of 
+    shape (C, N_d) of 0s and 1s, or a single such row, or of a scipy.sparse 
+    matrix of that shape, and it returns a boolean array of shape (C, N), or 
+    (N,) for a single cochain. If format == 'support' each cochain is given 
+    by the positions in faces of the simplices where it is 1, as a list of 
+    such lists or a single one. If format == 'packed' the cochains are a uint8
+    array of shape (N_d, ceil(C/8)) whose rows are their values packed with 
+    numpy.packbits, and the answer is packed in the same way, with shape 
+    (N, ceil(C/8)). All cochains are computed at once using 
+    Sq^k(a) = a cup_{d-k} a with the cochains packed as bits.'''
+
+    faces, simplices = np.asarray(faces), np.asarray(simplices)
+    d = faces.shape[1]-1
+    n, i = d+k, d-k
+    if simplices.shape[1] != n+1:
+        raise ValueError('simplices must have dimension d+k')
+
+    bits, count, single = _cochain_bits(cochains, len(faces), format)
+    answer = np.zeros((len(simplices), bits.shape[1]), dtype=np.uint8)
+
+    if 0 <= i and k >= 0 and len(simplices):
+        biops = {biop for biop in steenrod_diagonal(i, n) 
+                 if biop[0].degree == biop[1].degree == -k}
+        idx = vertex_indices(biops, n)[(d, d)]
+        index = SimplexIndex(faces)
+        left = index.lookup(simplices[:, idx[:, :d+1]])
+        right = index.lookup(simplices[:, idx[:, d+1:]])
+        if np.any(left < 0) or np.any(right < 0):
+            raise ValueError('faces must contain every face of the simplices')
+
+        for t in range(idx.shape[0]):
+            answer ^= bits[left[:, t]] & bits[right[:, t]]
+
+    if format == 'packed':
+        return answer
+
+    answer = np.unpackbits(answer.T, axis=0, count=count).astype(bool)
+
+    return answer[0] if single else answer
+
+def action_matrix(multiop, source, targets, format=None):
+    '''returns the mod 2 matrix of the chain map induced by an Operator, a 
+    multioperator or a set of such from the span of the n-simplices in the 
+    integer array source of shape (N, n+1) to the span of the multisimplices
+    whose factors are listed in targets, one integer array of shape (M_j, m_j+1),
+    or SimplexIndex, per factor. Its transpose is the induced cochain map.
+
+    The rows are indexed by the product of the target lists, in the order of
+    numpy.ravel_multi_index, and the columns by the source simplices. Only the
+    multioperators whose factors have dimensions m_j contribute, and resulting 
+    multisimplices with a degenerate factor are dropped. 
+
+    The matrix is a scipy.sparse matrix in format, by default 'csr', or if 
+    format == 'packed' or scipy is not installed, a uint8 array of shape 
+    (M, ceil(N/8)) whose rows are packed with numpy.packbits.'''
+
+    source = np.asarray(source)
+    if isinstance(targets, (SimplexIndex, np.ndarray)):
+        targets = [targets]
+    indices = [target if isinstance(target, SimplexIndex) else SimplexIndex(target)
+               for target in targets]
+    dims = tuple(index.width-1 for index in indices)
+    shape = tuple(len(index) for index in indices)
+    size = int(np.prod(shape, dtype=np.int64))
+
+    rows, cols = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    idx = vertex_indices(multiop, source.shape[1]-1).get(dims)
+    if idx is not None and len(source):
+        vertices = source[:, idx]
+        bounds = np.cumsum((0,) + tuple(m+1 for m in dims))
+        positions, valid = [], np.ones(vertices.shape[:2], dtype=bool)
+        for index, a, b in zip(indices, bounds[:-1], bounds[1:]):
+            factor = vertices[..., a:b]
+            position = index.lookup(factor)
+            degenerate = np.any(factor[..., 1:] == factor[..., :-1], axis=-1)
+            if np.any((position < 0) & ~degenerate):
+                raise ValueError('targets must contain every nondegenerate '+
+                                 'factor of the image')
+            valid &= ~degenerate
+            positions.append(position)
+
+        cols = np.broadcast_to(np.arange(len(source))[:, None], valid.shape)[valid]
+        rows = np.ravel_multi_index([position[valid] for position in positions], shape)
+
+        # entries reached an odd number of times
+        keys, counts = np.unique(rows * len(source) + cols, return_counts=True)
+        rows, cols = np.divmod(keys[counts % 2 == 1], len(source))
+
+    if format != 'packed':
+        try:
+            from scipy import sparse
+        except ImportError:
+            if format is not None:
+                raise
+        else:
+            data = np.ones(len(rows), dtype=np.uint8)
+            matrix = sparse.coo_matrix((data, (rows, cols)), shape=(size, len(source)))
+            return matrix.asformat(format or 'csr')
+
+    answer = np.zeros((size, -(-len(source) // 8)), dtype=np.uint8)
+    np.bitwise_or.at(answer, (rows, cols // 8), 
+                     np.left_shift(1, 7 - cols % 8).astype(np.uint8))
+
+    return answer
+
+class SimplexIndex(object):
+    '''
+    Lookup table of the rows of an integer array of shape (N, n+1) of simplices.
+
+    Parameters
+    ----------
+    simplices : array
+                An integer array whose rows are the simplices to be indexed
+
+    '''
+
+    def __init__(self, simplices):
+
+        simplices = np.asarray(simplices, dtype=np.int64)
+        self.simplices = simplices
+        self.base = int(simplices.max()) + 1 if simplices.size else 1
+        self.width = simplices.shape[1]
+
+        # rows are encoded as integers in base max+1 when these fit in 64 bits
+        if self.base ** self.width < 2**63:
+            self.powers = self.base ** np.arange(self.width-1, -1, -1, dtype=np.int64)
+            keys = simplices @ self.powers
+            self.order = np.argsort(keys, kind='stable')
+            self.keys = keys[self.order]
+        else:
+            self.powers = None
+            self.table = {tuple(row): i for i, row in enumerate(simplices.tolist())}
+
+    def __len__(self):
+
+        return len(self.simplices)
+
+    def lookup(self, rows):
+        '''returns the integer array of positions of the rows of an array of 
+        shape (..., n+1) among the indexed simplices, -1 for those not found'''
+
+        rows = np.asarray(rows, dtype=np.int64)
+        shape = rows.shape[:-1]
+        rows = rows.reshape(-1, self.width)
+
+        if self.powers is None:
+            answer = np.array([self.table.get(tuple(row), -1) for row in rows.tolist()],
+                              dtype=np.int64)
+            return answer.reshape(shape)
+
+        if not len(self.keys):
+            return np.full(shape, -1, dtype=np.int64)
+
+        valid = np.all((rows >= 0) & (rows < self.base), axis=1)
+        keys = np.where(valid, rows @ self.powers, -1)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys)-1)
+        found = valid & (self.keys[pos] == keys)
+
+        return np.where(found, self.order[pos], -1).reshape(shape)
+
+def vertex_indices(multiop, n):
+    '''returns a dictionary whose keys are the tuples of dimensions of the
+    factors of the multioperators in an Operator, multioperator or set of such,
+    and whose values are integer arrays of shape (T, L) listing, for each of
+    the T multioperators with those dimensions, the concatenated vertices of an
+    n-simplex picked by its factors'''
+
+    if isinstance(multiop, Operator):
+        multiop = {(multiop,)}
+    elif isinstance(multiop, tuple):
+        multiop = {multiop}
+    elif not isinstance(multiop, (set, frozenset)):
+        raise TypeError('cannot act: must be Operator, '+
+                        'tuple of them, or a set of such tuples')
+
+    groups = {}
+    for term in multiop:
+        if isinstance(term, Operator):
+            term = (term,)
+        dims = tuple(n + op.degree for op in term)
+        groups.setdefault(dims, []).append(term)
+
+    answer = {}
+    for dims, terms in groups.items():
+        answer[dims] = np.concatenate(
+            [indices_many(pack_many(factor), n) for factor in zip(*terms)],
+            axis=-1)
+
+    return answer
+
+def reduce_mod_2(rows):
+    '''returns the sorted rows of an array appearing an odd number of times'''
+
+    if not len(rows):
+        return rows
+
+    unique, counts = np.unique(rows, axis=0, return_counts=True)
+
+    return unique[counts % 2 == 1]
+
+def _cochain_bits(cochains, size, format=None):
+    '''returns the uint8 array of shape (size, ceil(C/8)) of the values of C
+    cochains on size simplices packed as bits, together with C and whether a
+    single cochain was passed, see steenrod_square for the formats'''
+
+    if format == 'packed':
+        bits = np.asarray(cochains, dtype=np.uint8)
+        if bits.ndim != 2 or bits.shape[0] != size:
+            raise ValueError('packed cochains must have a row for each face')
+        return np.ascontiguousarray(bits), 8*bits.shape[1], False
+
+    if format == 'support':
+        single = all(np.ndim(support) == 0 for support in cochains)
+        supports = [cochains] if single else list(cochains)
+        rows = np.repeat(np.arange(len(supports)), [len(c) for c in supports])
+        cols = np.fromiter((v for c in supports for v in c), dtype=np.int64,
+                           count=len(rows))
+    elif format is not None:
+        raise ValueError('format must be None, \'support\' or \'packed\'')
+    elif hasattr(cochains, 'tocoo'):
+        # scipy.sparse matrices are read without densifying them
+        matrix = cochains.tocoo()
+        single, supports = False, range(matrix.shape[0])
+        if matrix.shape[1] != size:
+            raise ValueError('cochains must have a value for each face')
+        rows, cols = matrix.row[matrix.data % 2 == 1], matrix.col[matrix.data % 2 == 1]
+    else:
+        values = np.asarray(cochains)
+        single = values.ndim == 1
+        values = np.atleast_2d(values).astype(bool)
+        if values.shape[1] != size:
+            raise ValueError('cochains must have a value for each face')
+        # one bit per cochain, eight cochains per byte
+        bits = np.ascontiguousarray(np.packbits(values, axis=0).T)
+        return bits, len(values), single
+
+    if np.any((cols < 0) | (cols >= size)):
+        raise ValueError('cochains must have a value for each face')
+
+    # repeated entries are added mod 2, each toggling its bit
+    bits = np.zeros((size, -(-len(supports) // 8)), dtype=np.uint8)
+    np.bitwise_xor.at(bits, (cols, rows // 8), 
+                      np.left_shift(1, 7 - rows % 8).astype(np.uint8))
+
+    return bits, len(supports), single
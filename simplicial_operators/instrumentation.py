@@ -0,0 +1,95 @@
+'''
+Opt-in counters and timings of the hot paths of the package.
+
+Recording is off by default, in which case every hook reduces to checking the
+module attribute enabled. It is turned on within the block of instrument:
+
+    with instrument() as report:
+        cartan_operator(3, 9)
+    print(report())
+
+The report is a dictionary with the totals of every counter and, for every
+timed section, its number of calls and total time in seconds.
+'''
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+enabled = False
+
+_counters = defaultdict(int)
+_timings = defaultdict(lambda: [0, 0.0])
+
+def count(name, k=1):
+    '''adds k to the counter name'''
+
+    _counters[name] += k
+
+@contextmanager
+def timer(name):
+    '''adds the time spent in its block to the timing name'''
+
+    if not enabled:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = _timings[name]
+        timing[0] += 1
+        timing[1] += time.perf_counter() - start
+
+@contextmanager
+def instrument(reset=True):
+    '''turns recording on within its block, yielding the function report.
+    If reset == True the previous records are discarded'''
+
+    global enabled
+
+    if reset:
+        clear()
+
+    previous, enabled = enabled, True
+    try:
+        yield report
+    finally:
+        enabled = previous
+
+def enable():
+    '''turns recording on'''
+
+    global enabled
+    enabled = True
+
+def disable():
+    '''turns recording off'''
+
+    global enabled
+    enabled = False
+
+def clear():
+    '''discards all records'''
+
+    _counters.clear()
+    _timings.clear()
+
+def report():
+    '''returns the records as a dictionary'''
+
+    return {'counters': dict(sorted(_counters.items())),
+            'timings': {name: {'calls': calls, 'total': total}
+                        for name, (calls, total) in sorted(_timings.items())}}
+
+def to_json(path=None):
+    '''returns the records as a JSON string, also written to path if passed'''
+
+    string = json.dumps(report(), indent=2)
+    if path is not None:
+        with open(path, 'w') as file:
+            file.write(string)
+
+    return string
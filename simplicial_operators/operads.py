@@ -0,0 +1,179 @@
+'''
+Operadic compositions in the Barratt-Eccles and surjection operads.
+
+Permutations and surjections are tuples of values (f(1), ..., f(m)) and basis
+elements of the Barratt-Eccles operad are tuples of permutations of the same
+arity. The partial composition x o_i y inserts y at the input i of x, and
+sums of basis elements are represented by sets, with coefficients in F_2.
+
+The compositions of basis elements are computed once and kept in bounded
+caches, see cache_info.
+'''
+
+from functools import lru_cache
+from itertools import combinations_with_replacement
+from ._utils import shuffles
+from .base_class import F2Chain
+from .surjections import is_degenerate_surjection
+from .barratt_eccles import is_degenerate_element
+
+# maximal number of pairs of basis elements whose compositions are kept in memory
+OPERADS_CACHE_SIZE = 2**14
+
+def permutation_partial(sigma, i, tau):
+    '''returns the partial composition sigma o_i tau of two permutations,
+    replacing the value i of sigma by the values of tau shifted by i-1'''
+
+    s = len(tau)
+    if not 1 <= i <= len(sigma):
+        raise ValueError('i must be between 1 and the arity of sigma')
+
+    answer = []
+    for value in sigma:
+        if value < i:
+            answer.append(value)
+        elif value > i:
+            answer.append(value + s - 1)
+        else:
+            answer.extend(v + i - 1 for v in tau)
+
+    return tuple(answer)
+
+def permutation_composition(sigma, taus):
+    '''returns the composition of a permutation of arity r with r permutations'''
+
+    if len(taus) != len(sigma):
+        raise ValueError('a permutation must be composed with one per input')
+
+    answer = sigma
+    for i in reversed(range(len(taus))):
+        answer = permutation_partial(answer, i+1, taus[i])
+
+    return answer
+
+def barratt_eccles_partial(x, i, y):
+    '''returns the partial composition x o_i y of two sums of basis elements
+    in the Barratt-Eccles operad. The composition of (s_0, ..., s_p) and
+    (t_0, ..., t_q) adds the sequences (s_a o_i t_b) along the lattice paths
+    from (0,0) to (p,q) given by the (p,q)-shuffles, the degenerate ones
+    being zero'''
+
+    if not isinstance(x, set):
+        x = {x}
+    if not isinstance(y, set):
+        y = {y}
+
+    answer = F2Chain()
+    for a in x:
+        for b in y:
+            answer ^= _barratt_eccles_partial(a, i, b)
+
+    return answer
+
+def barratt_eccles_composition(x, ys):
+    '''returns the composition of a sum of basis elements of arity r in the
+    Barratt-Eccles operad with r sums of basis elements'''
+
+    answer = x
+    for i in reversed(range(len(ys))):
+        answer = barratt_eccles_partial(answer, i+1, ys[i])
+
+    return F2Chain(answer) if isinstance(answer, set) else F2Chain({answer})
+
+def surjection_partial(u, i, v):
+    '''returns the partial composition u o_i v of two sums of surjections. If
+    i appears k times in u, v is cut in k consecutive pieces overlapping at
+    their ends in every possible way, and the j-th occurrence of i is replaced
+    by the j-th piece shifted by i-1, the degenerate results being zero'''
+
+    if not isinstance(u, set):
+        u = {u}
+    if not isinstance(v, set):
+        v = {v}
+
+    answer = F2Chain()
+    for a in u:
+        for b in v:
+            answer ^= _surjection_partial(a, i, b)
+
+    return answer
+
+def surjection_composition(u, vs):
+    '''returns the composition of a sum of surjections of arity r with r sums
+    of surjections'''
+
+    answer = u
+    for i in reversed(range(len(vs))):
+        answer = surjection_partial(answer, i+1, vs[i])
+
+    return F2Chain(answer) if isinstance(answer, set) else F2Chain({answer})
+
+def cache_info():
+    '''returns the hit, miss and size statistics of the caches of compositions'''
+
+    return {'barratt_eccles_partial': _barratt_eccles_partial.cache_info(),
+            'surjection_partial': _surjection_partial.cache_info()}
+
+def cache_clear():
+    '''empties the caches of compositions'''
+
+    _barratt_eccles_partial.cache_clear()
+    _surjection_partial.cache_clear()
+
+@lru_cache(maxsize=OPERADS_CACHE_SIZE)
+def _barratt_eccles_partial(x, i, y):
+    '''returns the frozenset of basis elements in x o_i y'''
+
+    p, q = len(x)-1, len(y)-1
+    compositions = {}
+
+    answer = F2Chain()
+    for mu, _ in shuffles(p, q):
+        # the k-th step of the path moves along x if k is in mu
+        a = b = 0
+        element = [(0, 0)]
+        for k in range(p+q):
+            if a < p and mu[a] == k:
+                a += 1
+            else:
+                b += 1
+            element.append((a, b))
+
+        for ab in element:
+            if ab not in compositions:
+                compositions[ab] = permutation_partial(x[ab[0]], i, y[ab[1]])
+        element = tuple(compositions[ab] for ab in element)
+
+        if not is_degenerate_element(element):
+            answer.toggle(element)
+
+    return frozenset(answer)
+
+@lru_cache(maxsize=OPERADS_CACHE_SIZE)
+def _surjection_partial(u, i, v):
+    '''returns the frozenset of surjections in u o_i v'''
+
+    r, s = max(u), max(v)
+    if not 1 <= i <= r:
+        raise ValueError('i must be between 1 and the arity of u')
+
+    u = tuple(value + s - 1 if value > i else value for value in u)
+    v = tuple(value + i - 1 for value in v)
+    k = u.count(i)
+
+    answer = F2Chain()
+    for cuts in combinations_with_replacement(range(len(v)), k-1):
+        ends = (0,) + cuts + (len(v)-1,)
+        surjection, j = [], 0
+        for value in u:
+            if value == i:
+                surjection.extend(v[ends[j]:ends[j+1]+1])
+                j += 1
+            else:
+                surjection.append(value)
+        surjection = tuple(surjection)
+
+        if not is_degenerate_surjection(surjection):
+            answer.toggle(surjection)
+
+    return frozenset(answer)
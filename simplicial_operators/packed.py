@@ -0,0 +1,251 @@
+'''
+Bit-packed encoding of simplicial operators.
+
+An operator in canonical form s > ... > s d < ... < d is determined by the
+sets of indices of its degeneracy and face maps, so it is stored as the pair
+of integers (deg_mask, face_mask) whose set bits are those indices.
+
+Single operators use Python integers and have no size limit. Batches of
+operators are stored as NumPy arrays of shape (..., 2) and dtype uint64,
+whose last axis holds (deg_mask, face_mask); the batched kernels act on
+whole arrays at once and support indices up to 62.
+'''
+
+import numpy as np
+from .base_class import Operator
+
+WIDTH = 64
+_ONE = np.uint64(1)
+_ZERO = np.uint64(0)
+
+def pack(op):
+    '''returns the pair of bitmasks (deg_mask, face_mask) encoding an Operator'''
+
+    deg_mask, face_mask = 0, 0
+    for i in op.deg_maps:
+        deg_mask |= 1 << i
+    for i in op.face_maps:
+        face_mask |= 1 << i
+
+    return deg_mask, face_mask
+
+def unpack(code):
+    '''returns the Operator encoded by a pair of bitmasks (deg_mask, face_mask)'''
+
+    deg_mask, face_mask = (int(v) for v in code)
+
+    return Operator(deg_maps = reversed(_bits(deg_mask)),
+                    face_maps = _bits(face_mask))
+
+def packed_compose(left, right):
+    '''returns the code of the composition left right of two encoded operators'''
+
+    s_left, d_left = left
+    s_right, d_right = right
+
+    # getting s_right passed d_left
+    s, d = _exchange(d_left, s_right)
+
+    return s_left | _deposit(s, ~s_left), d_right | _deposit(d, ~d_right)
+
+def packed_call(code, simplex):
+    '''applies an encoded operator to a simplex represented by a list or a tuple'''
+
+    deg_mask, face_mask = code
+
+    if face_mask.bit_length() > len(simplex):
+        raise ValueError('simplex not in the domain of the operator')
+
+    answer = []
+    for i, v in enumerate(simplex):
+        if not face_mask >> i & 1:
+            answer.append(v)
+            while deg_mask >> len(answer)-1 & 1:
+                answer.append(v)
+
+    if deg_mask >> len(answer):
+        raise ValueError('simplex not in the domain of the operator')
+
+    return tuple(answer)
+
+def packed_prime(code):
+    '''adds 1 to all the numbers defining the face and degeneracy maps
+    of an encoded operator'''
+
+    deg_mask, face_mask = code
+
+    return deg_mask << 1, face_mask << 1
+
+def pack_many(operators):
+    '''returns the array of shape (N, 2) encoding a collection of N Operators'''
+
+    codes = [pack(op) for op in operators]
+    if any(v >> WIDTH-2 for code in codes for v in code):
+        raise ValueError('operator too large for the batched encoding')
+
+    return np.array(codes, dtype=np.uint64).reshape(-1, 2)
+
+def unpack_many(codes):
+    '''returns the list of Operators encoded by an array of shape (N, 2)'''
+
+    return [unpack(code) for code in np.asarray(codes).reshape(-1, 2)]
+
+def compose_many(left, right):
+    '''returns the codes of the compositions left right of two arrays of
+    encoded operators, which are broadcast against each other'''
+
+    left, right = np.broadcast_arrays(_as_codes(left), _as_codes(right))
+    s_left, d_left = left[..., 0], left[..., 1]
+    s_right, d_right = right[..., 0], right[..., 1]
+
+    # getting s_right passed d_left
+    s, d = _exchange_many(d_left, s_right)
+
+    return np.stack([s_left | _deposit_many(s, ~s_left),
+                     d_right | _deposit_many(d, ~d_right)], axis=-1)
+
+def prime_many(codes):
+    '''adds 1 to all the numbers defining the face and degeneracy maps
+    of an array of encoded operators'''
+
+    codes = _as_codes(codes)
+    if np.any(codes >> np.uint64(WIDTH-2)):
+        raise ValueError('operator too large for the batched encoding')
+
+    return codes << _ONE
+
+def indices_many(codes, n):
+    '''returns the integer array of shape (..., m+1) whose rows list the
+    vertices of an n-simplex picked by each of the encoded operators,
+    which must all have the same degree m-n'''
+
+    codes = _as_codes(codes)
+    shape = codes.shape[:-1]
+    deg_masks, face_masks = codes.reshape(-1, 2).T
+
+    faces = _unpack_bits(face_masks, WIDTH).astype(bool)
+    if faces[:, n+1:].any():
+        raise ValueError('simplex not in the domain of the operator')
+
+    length = (n + 1 - faces[:, :n+1].sum(axis=1)
+              + _unpack_bits(deg_masks, WIDTH).sum(axis=1))
+    if np.any(length != length[:1]):
+        raise ValueError('operators must have the same degree')
+    m = int(length[0]) - 1 if length.size else n
+
+    degs = _unpack_bits(deg_masks, WIDTH)
+    if degs[:, max(m, 0):].any():
+        raise ValueError('simplex not in the domain of the operator')
+
+    # the vertex in position k is the (k - #{degeneracies < k})-th kept one
+    kept = np.argsort(faces[:, :n+1], axis=1, kind='stable')
+    rank = np.arange(m+1) - np.cumsum(degs[:, :m+1], axis=1) + degs[:, :m+1]
+    answer = np.take_along_axis(kept, rank, axis=1)
+
+    return answer.reshape(shape + (m+1,))
+
+def call_many(codes, simplices):
+    '''applies every encoded operator to every simplex in an integer array of
+    shape (..., n+1), returning an array of shape (..., N, m+1)'''
+
+    simplices = np.asarray(simplices)
+    idx = indices_many(codes, simplices.shape[-1]-1)
+
+    return simplices[..., idx]
+
+def _bits(mask):
+    '''returns the increasing tuple of positions of the set bits of a
+    non-negative integer'''
+
+    answer = []
+    while mask:
+        low = mask & -mask
+        answer.append(low.bit_length()-1)
+        mask ^= low
+
+    return tuple(answer)
+
+def _deposit(bits, mask):
+    '''scatters the bits of bits, in order, into the positions of the set
+    bits of mask (which may be negative)'''
+
+    answer = 0
+    while bits:
+        low = mask & -mask
+        if bits & 1:
+            answer |= low
+        mask ^= low
+        bits >>= 1
+
+    return answer
+
+def _exchange(faces, degs):
+    '''returns the masks of s and d with d(faces) s(degs) = s d'''
+
+    new_degs, new_faces = 0, 0
+    i, j, previous, hit = 0, 0, -1, False
+    for t in range(max(faces.bit_length(), degs.bit_length()+1)+1):
+        # kept vertices sent to the same vertex yield a degeneracy
+        if not faces >> t & 1:
+            if previous == j:
+                new_degs |= 1 << i-1
+            previous, hit = j, True
+            i += 1
+        # vertices not hit by any kept vertex yield a face
+        if not degs >> t & 1:
+            if not hit:
+                new_faces |= 1 << j
+            j, hit = j+1, False
+
+    return new_degs, new_faces
+
+def _as_codes(codes):
+
+    codes = np.asarray(codes, dtype=np.uint64)
+    if codes.shape[-1:] != (2,):
+        raise ValueError('expected an array of shape (..., 2)')
+
+    return codes
+
+def _unpack_bits(masks, width):
+    '''returns the array of shape (N, width) of the bits of N masks'''
+
+    return ((masks[:, None] >> np.arange(width, dtype=np.uint64)) & _ONE).astype(np.int64)
+
+def _deposit_many(bits, masks):
+
+    answer = np.zeros_like(bits)
+    for t in range(WIDTH):
+        slot = (masks >> np.uint64(t)) & _ONE
+        answer |= (bits & slot) << np.uint64(t)
+        bits = bits >> slot
+    if np.any(bits):
+        raise ValueError('operator too large for the batched encoding')
+
+    return answer
+
+def _exchange_many(faces, degs):
+
+    new_degs, new_faces = np.zeros_like(faces), np.zeros_like(faces)
+    i = np.zeros(faces.shape, dtype=np.uint64)
+    j = np.zeros(faces.shape, dtype=np.uint64)
+    previous = np.full(faces.shape, -1, dtype=np.int64)
+    hit = np.zeros(faces.shape, dtype=bool)
+    for t in range(WIDTH):
+        kept = ((faces >> np.uint64(t)) & _ONE) == _ZERO
+        repeat = kept & (previous == j.astype(np.int64))
+        new_degs |= np.where(repeat, _ONE << np.maximum(i, _ONE) - _ONE, _ZERO)
+        previous = np.where(kept, j.astype(np.int64), previous)
+        hit |= kept
+        i += kept.astype(np.uint64)
+
+        ends = ((degs >> np.uint64(t)) & _ONE) == _ZERO
+        new_faces |= np.where(ends & ~hit, _ONE << j, _ZERO)
+        j += ends.astype(np.uint64)
+        hit &= ~ends
+
+    # past the last bit every vertex is kept and hits a new vertex
+    repeat = previous == j.astype(np.int64)
+    new_degs |= np.where(repeat, _ONE << np.maximum(i, _ONE) - _ONE, _ZERO)
+
+    return new_degs, new_faces
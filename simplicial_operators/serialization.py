@@ -0,0 +1,121 @@
+'''
+Compact binary format for sums of Operators and of multioperators.
+
+A serialized sum is a header followed by two arrays:
+
+    header  : magic b'SOPS', format version (uint16), arity (uint16, 0 for a
+              sum of Operators), number of terms (uint64) and sizes in bytes of
+              the unsigned integers storing the offsets and the maps (uint8 
+              each), padded to 24 bytes
+    offsets : array of length 2m+1 for the m = terms * max(arity, 1)
+              operators, the degeneracy maps of the k-th operator being
+              maps[offsets[2k]:offsets[2k+1]] and its face maps
+              maps[offsets[2k+1]:offsets[2k+2]], 
+              padded to a multiple of 8 bytes
+    maps    : array listing the maps of every operator in canonical order 
+              s > ... > s d < ... < d
+
+Integers are little endian and as narrow as the values allow. The arrays are 
+aligned, so they are read without copies with arrays.
+'''
+
+import struct
+import numpy as np
+from .base_class import Operator, F2Chain
+
+MAGIC = b'SOPS'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHQBB6x')
+
+def dumps(chain):
+    '''returns the bytes encoding an Operator, a multioperator or a set of such'''
+
+    if isinstance(chain, (Operator, tuple)):
+        chain = {chain}
+
+    terms = list(chain)
+    arity = 0
+    if terms and isinstance(terms[0], tuple):
+        arity = len(terms[0])
+    if any((len(term) if isinstance(term, tuple) else 0) != arity for term in terms):
+        raise ValueError('all terms must have the same number of factors')
+
+    operators = [op for term in terms for op in term] if arity else terms
+    lengths, maps = [0], []
+    for op in operators:
+        maps.extend(op.deg_maps)
+        lengths.append(len(op.deg_maps))
+        maps.extend(op.face_maps)
+        lengths.append(len(op.face_maps))
+
+    offsets_size = _itemsize(len(maps))
+    maps_size = _itemsize(max(maps, default=0))
+    offsets = np.cumsum(lengths).astype('<u%d' % offsets_size)
+    maps = np.array(maps, dtype='<u%d' % maps_size)
+
+    header = _HEADER.pack(MAGIC, VERSION, arity, len(terms), offsets_size, maps_size)
+    padding = bytes(-offsets.nbytes % 8)
+
+    return b''.join([header, offsets.tobytes(), padding, maps.tobytes()])
+
+def loads(buffer):
+    '''returns the F2Chain of Operators or multioperators encoded by a
+    bytes-like object'''
+
+    arity, count, offsets, maps = arrays(buffer)
+    offsets, maps = offsets.tolist(), maps.tolist()
+
+    operators = {}
+    def _operator(k):
+        start, middle, end = offsets[2*k:2*k+3]
+        key = (tuple(maps[start:middle]), tuple(maps[middle:end]))
+        if key not in operators:
+            operators[key] = Operator._canonical(*key).intern()
+        return operators[key]
+
+    if not arity:
+        return F2Chain(_operator(k) for k in range(count))
+
+    return F2Chain(tuple(_operator(t*arity + j) for j in range(arity))
+                   for t in range(count))
+
+def dump(chain, file):
+    '''writes the encoding of an Operator, a multioperator or a set of such
+    to a binary file'''
+
+    file.write(dumps(chain))
+
+def load(file):
+    '''returns the F2Chain encoded in a binary file'''
+
+    return loads(file.read())
+
+def arrays(buffer):
+    '''returns the arity, the number of terms and the arrays of offsets and
+    of maps of an encoded sum, which are views of the bytes-like object'''
+
+    buffer = memoryview(buffer).cast('B')
+    if len(buffer) < _HEADER.size:
+        raise ValueError('buffer too short for a header')
+
+    magic, version, arity, count, offsets_size, maps_size = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError('not a serialized sum of operators')
+    if version != VERSION:
+        raise ValueError('unsupported format version %d' % version)
+
+    size = 2*count*max(arity, 1) + 1
+    offsets = np.frombuffer(buffer, dtype='<u%d' % offsets_size, count=size, 
+                            offset=_HEADER.size)
+    start = _HEADER.size + offsets.nbytes + (-offsets.nbytes % 8)
+    maps = np.frombuffer(buffer, dtype='<u%d' % maps_size, count=int(offsets[-1]),
+                         offset=start)
+
+    return arity, count, offsets, maps
+
+def _itemsize(largest):
+    '''returns the least number of bytes among 1, 2, 4 and 8 storing the 
+    unsigned integer largest'''
+
+    return next(size for size in (1, 2, 4, 8) if largest < 2**(8*size))
@@ -1,28 +1,96 @@
-from itertools import combinations
-from .base_class import Operator
+from itertools import combinations, chain
+from math import comb
+from functools import lru_cache
+import numpy as np
+from .base_class import Operator, F2Chain
+from .combinatorics import iter_combinations
 
-def steenrod_diagonal(i, n):
-    '''...'''
-    if type(n) != int or n < 0 :
-        raise ValueError('The first entry (dimension) must be a non-negative integer')
+# maximal number of pairs (i, n) whose cup-i bioperators are kept in memory
+STEENROD_CACHE_SIZE = 256
+
+def steenrod_diagonal(i, n, index_range=None):
+    '''returns the bioperators defining the cup-i coproduct on n-simplices. 
+    Each pair (i, n) is computed once and kept in a bounded cache, see cache_info.
     
-    elif type(i) != int :
-        raise ValueError('The second entry (i) must be an integer')
+    If index_range = (start, stop) is passed only the bioperators given by the 
+    combinations of n-i elements of range(n+1) with indices in that range are 
+    returned, see the module combinatorics'''
+    _check_arguments(i, n)
 
-    elif n < i or i < 0 :
-        return set()
+    if index_range is not None:
+        return F2Chain(iter_steenrod_diagonal(i, n, index_range))
     
-    answer = set()
-    for U in combinations(range(n+1), n-i):
-        
-        U_minus, U_plus = [], []
-        for u in U :
-            if (U.index(u) + u) % 2 == 1:
-                U_minus.append(u)
-            else :
-                U_plus.append(u)
+    return F2Chain(_steenrod_diagonal_table(i, n))
+
+def iter_steenrod_diagonal(i, n, index_range=None):
+    '''returns a generator of the bioperators defining the cup-i coproduct 
+    on n-simplices, each produced once. See steenrod_diagonal for index_range'''
+    _check_arguments(i, n)
+
+    if n < i or i < 0 :
+        return iter(())
+
+    return _iter_steenrod_diagonal(i, n, index_range)
+
+def steenrod_parity_table(i, n):
+    '''returns a pair of arrays (U, odd) of shape (C, n-i) whose rows are the 
+    combinations U of n-i elements of range(n+1) in lexicographic order and the 
+    boolean mask of the positions of U going to the first factor of the cup-i 
+    coproduct, namely those u in U with u + (position of u) odd'''
+
+    count = comb(n+1, n-i)
+    U = np.fromiter(chain.from_iterable(combinations(range(n+1), n-i)), 
+                    dtype=np.int64, count=count*(n-i)).reshape(count, n-i)
+    odd = (U + np.arange(n-i)) % 2 == 1
+
+    return U, odd
+
+def cache_info():
+    '''returns the hit, miss and size statistics of the cache used by 
+    steenrod_diagonal'''
+
+    return {'steenrod_diagonal': _steenrod_diagonal_table.cache_info()}
+
+def cache_clear():
+    '''empties the cache used by steenrod_diagonal'''
+
+    _steenrod_diagonal_table.cache_clear()
+
+@lru_cache(maxsize=STEENROD_CACHE_SIZE)
+def _steenrod_diagonal_table(i, n):
+
+    if n < i or i < 0 :
+        return frozenset()
+
+    U, odd = steenrod_parity_table(i, n)
+
+    return frozenset(_bioperators(zip(U.tolist(), odd.tolist())))
+
+def _iter_steenrod_diagonal(i, n, index_range=None):
+    '''generates the bioperators one combination at a time, without building
+    the parity table'''
+
+    if index_range is None:
+        U = combinations(range(n+1), n-i)
+    else:
+        U = iter_combinations(n+1, n-i, *index_range)
+
+    return _bioperators((u, [(v + k) % 2 == 1 for k, v in enumerate(u)]) for u in U)
+
+def _bioperators(pairs):
+    '''returns a generator of the bioperators given by pairs (u, parity) of a 
+    combination and the mask of its positions going to the first factor'''
+
+    for u, parity in pairs:
+        U_minus = [v for v, p in zip(u, parity) if p]
+        U_plus = [v for v, p in zip(u, parity) if not p]
         
-        answer ^= {(Operator(face_maps = U_minus), 
-                    Operator(face_maps = U_plus))}
+        yield (Operator(face_maps = U_minus), Operator(face_maps = U_plus))
+
+def _check_arguments(i, n):
+
+    if type(n) != int or n < 0 :
+        raise ValueError('The first entry (dimension) must be a non-negative integer')
     
-    return answer
\ No newline at end of file
+    elif type(i) != int :
+        raise ValueError('The second entry (i) must be an integer')
\ No newline at end of file
@@ -0,0 +1,108 @@
+'''
+Persistent on-disk store of computed tables.
+
+The multioperators computed by shih, eilenberg_zilber and cartan_operator are
+deterministic, so once a directory is set, either with set_directory or with
+the environment variable SIMPLICIAL_OPERATORS_CACHE, they are written to it
+and read back by any later process instead of being recomputed.
+
+Each table is a .sops file in a subdirectory named after the version of the
+store, in the format of the module serialization, which has no bound on the
+indices of the maps. Files are memory-mapped for reading and written 
+atomically, so several processes can share a directory. The store is 
+transparent: a table that cannot be read is recomputed, and one that cannot 
+be written, for instance in a read-only directory or a full disk, is only 
+kept in memory, with a warning.
+'''
+
+import os
+import tempfile
+import warnings
+import numpy as np
+from . import serialization
+
+VERSION = 2
+ENVIRONMENT_VARIABLE = 'SIMPLICIAL_OPERATORS_CACHE'
+
+_directory = os.environ.get(ENVIRONMENT_VARIABLE) or None
+
+def set_directory(path):
+    '''sets the directory of the store, None disables it'''
+
+    global _directory
+    _directory = None if path is None else os.fspath(path)
+
+def get_directory():
+    '''returns the directory of the store, or None if it is disabled'''
+
+    return _directory
+
+def path(name, params):
+    '''returns the path of the file of a table given by the name of its
+    construction and a tuple of integer parameters'''
+
+    filename = '-'.join([name] + [str(p) for p in params]) + '.sops'
+
+    return os.path.join(_directory, 'v%d' % VERSION, filename)
+
+def contains(name, params):
+    '''returns True if the table has been stored'''
+
+    return _directory is not None and os.path.exists(path(name, params))
+
+def load(name, params):
+    '''returns the stored table as a frozenset of multioperators, or None if
+    the store is disabled or the table has not been stored'''
+
+    if _directory is None:
+        return None
+
+    try:
+        buffer = np.memmap(path(name, params), dtype=np.uint8, mode='r')
+        return frozenset(serialization.loads(buffer))
+    except (OSError, ValueError):
+        return None
+
+def save(name, params, multiops):
+    '''writes a table of multioperators to the store, returning False if the
+    store is disabled or the table could not be written'''
+
+    if _directory is None:
+        return False
+
+    data = serialization.dumps(multiops)
+    target = path(name, params)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    except OSError as error:
+        warnings.warn(f'cannot write to the store in {_directory}: {error.strerror}')
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, target)
+    except BaseException as error:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        if not isinstance(error, OSError):
+            raise
+        warnings.warn(f'cannot write to the store in {_directory}: {error.strerror}')
+        return False
+
+    return True
+
+def clear():
+    '''removes every table of the current version from the store'''
+
+    if _directory is None:
+        return
+
+    directory = os.path.join(_directory, 'v%d' % VERSION)
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.sops'):
+                os.remove(os.path.join(directory, filename))
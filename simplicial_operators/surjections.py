@@ -1,47 +1,257 @@
-from .base_class import Operator
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from .base_class import Operator, F2Chain
+from . import instrumentation
 
-def surjection_operator(surjections, n):
+def surjection_operator(surjections, n, equal_degrees=(), degrees=None, 
+                        nondegenerate=False):
     '''returns the set of multioperators representing the action of the passed 
-    set of surjection on a n-simplex'''
+    set of surjection on a n-simplex. 
     
-    def _new_term(term, num_to_append, pos_to_append, k):
-        tuple_to_replace = term['seq'][pos_to_append]+(num_to_append,)
-
-        return {'pos': term['pos']+k, 
-                'seq': term['seq'][:pos_to_append] 
-                        + (tuple_to_replace,)
-                        + term['seq'][pos_to_append+1:]}
-        
+    The following constraints are enforced during the search, which skips any 
+    partial term that cannot satisfy them:
+    
+    equal_degrees : pairs of factors which must have the same degree
+    degrees       : degree required for each factor, either as a sequence 
+                    with None for unconstrained factors or as a dictionary
+    nondegenerate : if True degenerate surjections are skipped, whose action
+                    is zero in normalized chains'''
+    
+    answer = F2Chain()
+    with instrumentation.timer('surjection_operator'):
+        answer.toggle_all(iter_surjection_operator(surjections, n, equal_degrees, 
+                                                   degrees, nondegenerate))
+
+    return answer
+
+def iter_surjection_operator(surjections, n, equal_degrees=(), degrees=None, 
+                             nondegenerate=False):
+    '''returns a generator of the multioperators representing the action of the 
+    passed set of surjection on a n-simplex. They are produced by a depth first 
+    search, so memory is proportional to the length of the surjection plus n, and 
+    repeated multioperators are meant to be added mod 2. See surjection_operator 
+    for the constraints'''
+
     if not isinstance(surjections, set):
         surjections = {surjections}
+
+    degrees = _normalize_degrees(degrees)
+    for surj in surjections:
+        if nondegenerate and is_degenerate_surjection(surj):
+            continue
+        yield from _iter_surjection_operator(surj, n, equal_degrees, degrees)
+
+def parallel_surjection_operator(surjections, n, equal_degrees=(), degrees=None, 
+                                 nondegenerate=False, max_workers=None, 
+                                 chunksize=None, executor=None):
+    '''returns the same as surjection_operator, distributing the search across 
+    the processes of a pool with max_workers processes, or across the passed 
+    concurrent.futures executor, and adding the partial results mod 2 along a 
+    binary tree. 
     
-    answer = set() 
+    Since a few surjections can have much larger search trees than the others, 
+    the search tree of each one is first expanded breadth first until at least 
+    4 max_workers subtrees are pending, and these are sent to the workers in 
+    chunks of chunksize subtrees'''
+
+    if not isinstance(surjections, set):
+        surjections = {surjections}
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers) as executor:
+            return parallel_surjection_operator(surjections, n, equal_degrees, 
+                                                degrees, nondegenerate, 
+                                                max_workers, chunksize, executor)
+
+    surjections = sorted(surj for surj in surjections if not 
+                         (nondegenerate and is_degenerate_surjection(surj)))
+    equal_degrees, degrees = tuple(equal_degrees), _normalize_degrees(degrees)
+    units = 4*(max_workers or os.cpu_count())
+
+    # subtrees (surj, roots) of the searches, and the terms found expanding them
+    expanded, subtrees = [], []
     for surj in surjections:
-        after = [{'pos': 0, 
-                  'seq': ((),)*(surj[0]-1) + ((0,),) + ((),)*(max(surj)-surj[0])}]
-        
-        for i in range(n+len(surj)-1):
-            before = after[:]
-            after = []
-            for term in before:
-                if term['pos'] < len(surj)-1:
-                    num_to_append = term['seq'][surj[term['pos']]-1][-1]
-                    pos_to_append = surj[term['pos']+1]-1
-
-                    empty = bool(term['seq'][pos_to_append])
-                    if not empty or num_to_append != term['seq'][pos_to_append][-1]:
-                        after.append(_new_term(term, num_to_append, pos_to_append,1))
-
-                if term['seq'][surj[term['pos']]-1][-1] < n:
-                    num_to_append = term['seq'][surj[term['pos']]-1][-1] + 1
-                    pos_to_append = surj[term['pos']]-1
-
-                    after.append(_new_term(term, num_to_append, pos_to_append,0))
-
-        for term in after:
-            operators = tuple()
-            for seq in term['seq']:
-                operators += (Operator(face_maps=[i for i in range(n+1) if i not in seq]),)
-            answer ^= {operators}
+        terms, roots = _split_surjection_operator(surj, n, equal_degrees, degrees, 
+                                                  units)
+        expanded.append(terms)
+        subtrees.extend((surj, [root]) for root in roots)
+
+    if chunksize is None:
+        chunksize = max(1, -(-len(subtrees) // units))
+
+    chunks = [subtrees[i:i+chunksize] for i in range(0, len(subtrees), chunksize)]
+    partials = list(executor.map(_surjection_operator_chunk, chunks, repeat(n), 
+                                 repeat(equal_degrees), repeat(degrees)))
+
+    return _xor_reduce(partials + expanded)
+
+def is_degenerate_surjection(surj):
+    '''returns True if two consecutive values of a surjection agree'''
+
+    return any(surj[k] == surj[k+1] for k in range(len(surj)-1))
+
+def _surjection_operator_chunk(subtrees, n, equal_degrees, degrees):
+    '''returns the sum of the multioperators in a list of subtrees (surj, roots)
+    of the searches'''
+
+    answer = F2Chain()
+    for surj, roots in subtrees:
+        answer.toggle_all(_iter_surjection_operator(surj, n, equal_degrees, degrees, 
+                                                    roots))
+
+    return answer
+
+def _xor_reduce(chains):
+    '''adds a list of F2Chains pairwise along a binary tree'''
+
+    if not chains:
+        return F2Chain()
+
+    while len(chains) > 1:
+        for i in range(0, len(chains)-1, 2):
+            chains[i] ^= chains[i+1]
+        chains = chains[::2]
+
+    return chains[0]
+
+def _normalize_degrees(degrees):
+    '''returns the constraints on degrees as a tuple of pairs (factor, degree)'''
+
+    if degrees is None:
+        return ()
+    if isinstance(degrees, dict):
+        return tuple(sorted(degrees.items()))
+
+    return tuple((j, deg) for j, deg in enumerate(degrees) if deg is not None)
+
+def _iter_surjection_operator(surj, n, equal_degrees=(), degrees=(), roots=None):
+    '''generates the multioperators of a surjection by a depth first search
+    from its initial partial term, or from the passed partial terms'''
+
+    root, step = _search(surj, n, equal_degrees, degrees)
+
+    stack = [root] if roots is None else list(roots)
+    states = pruned = terms = 0
+    while stack:
+        states += 1
+        term = step(stack.pop(), stack)
+        if term is None:
+            continue
+        if term is False:
+            pruned += 1
+            continue
+
+        terms += 1
+        yield term
+
+    if instrumentation.enabled:
+        instrumentation.count('surjection_operator.states', states)
+        instrumentation.count('surjection_operator.pruned', pruned)
+        instrumentation.count('surjection_operator.terms', terms)
+
+def _split_surjection_operator(surj, n, equal_degrees=(), degrees=(), count=1):
+    '''returns the multioperators of a surjection found while expanding its 
+    search tree breadth first until at least count partial terms are pending, 
+    and the list of those partial terms, the roots of disjoint subtrees 
+    containing the remaining multioperators'''
+
+    root, step = _search(surj, n, equal_degrees, degrees)
+
+    answer, queue = F2Chain(), deque([root])
+    while queue and len(queue) < count:
+        term = step(queue.popleft(), queue)
+        if term:
+            answer.toggle(term)
+
+    return answer, list(queue)
+
+def _search(surj, n, equal_degrees=(), degrees=()):
+    '''returns the initial partial term of the search for the multioperators
+    of a surjection and the function step(state, pending), which appends the
+    extensions of a partial term to pending and returns the multioperator it
+    is, None if it is not complete, or False if it cannot be completed under
+    the constraints'''
+    
+    def _new_seq(seq, num_to_append, pos_to_append):
+        return (seq[:pos_to_append] 
+                + (seq[pos_to_append]+(num_to_append,),) 
+                + seq[pos_to_append+1:])
+
+    def _feasible(pos, vertex, seq):
+        # the j-th factor gains one vertex for each later position sending to j
+        # and shares the n-vertex remaining advances with the other factors
+        # available at the current or later positions
+        remaining = n - vertex
+        for a, b in equal_degrees:
+            size_a = len(seq[a]) + later[pos][a]
+            size_b = len(seq[b]) + later[pos][b]
+            if size_a > size_b:
+                a, b, size_a, size_b = b, a, size_b, size_a
+            if size_a < size_b and (size_b - size_a > remaining or 
+                                    not (later[pos][a] or surj[pos]-1 == a)):
+                return False
+
+        needed = 0
+        for j, size in sizes:
+            missing = size - len(seq[j]) - later[pos][j]
+            if missing < 0 or missing and not (later[pos][j] or surj[pos]-1 == j):
+                return False
+            needed += missing
+
+        return needed <= remaining
+
+    def step(state, pending):
+        pos, vertex, seq = state
+
+        if constrained and not _feasible(pos, vertex, seq):
+            return False
+
+        if pos == last and vertex == n:
+            return tuple(Operator(face_maps=_complement(s, n)) for s in seq)
+
+        if vertex < n:
+            pending.append((pos, vertex+1, _new_seq(seq, vertex+1, surj[pos]-1)))
+
+        if pos < last:
+            pos_to_append = surj[pos+1]-1
+            if not seq[pos_to_append] or seq[pos_to_append][-1] != vertex:
+                pending.append((pos+1, vertex, _new_seq(seq, vertex, pos_to_append)))
+
+        return None
+
+    arity = max(surj)
+    if any(not 0 <= j < arity for pair in equal_degrees for j in pair):
+        raise ValueError('factors in equal_degrees must be less than the arity')
+    if any(not 0 <= j < arity for j, _ in degrees):
+        raise ValueError('factors in degrees must be less than the arity')
+
+    # a factor of degree k has n+k+1 vertices
+    sizes = tuple((j, n+deg+1) for j, deg in degrees)
+    constrained = bool(equal_degrees or degrees)
+
+    # later[pos][j] is the number of positions after pos sending to j
+    last = len(surj)-1
+    later = [[0]*arity for _ in surj]
+    for pos in reversed(range(last)):
+        later[pos] = later[pos+1][:]
+        later[pos][surj[pos+1]-1] += 1
+
+    # partial terms (pos, vertex, seq) where seq[j] are the vertices of the j-th
+    # factor and vertex is the last vertex appended at position pos of surj
+    root = (0, 0, ((),)*(surj[0]-1) + ((0,),) + ((),)*(arity-surj[0]))
+
+    return root, step
+
+def _complement(vertices, n):
+    '''returns the elements of range(n+1) not in the increasing tuple vertices'''
+
+    answer, k = [], 0
+    for i in range(n+1):
+        if k < len(vertices) and vertices[k] == i:
+            k += 1
+        else:
+            answer.append(i)
 
     return answer
\ No newline at end of file
@@ -0,0 +1,508 @@
+'''
+Regression tests of the closed forms and fast paths of simplicial_operators
+against the direct constructions they replace.
+'''
+
+import errno
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import combinations, permutations
+import numpy as np
+import pytest
+from simplicial_operators import (Operator, F2Chain, shih, steenrod_diagonal,
+                                  surjection_operator, iter_surjection_operator,
+                                  table_reduction, barratt_eccles_partial,
+                                  surjection_partial, cartan_first_homotopy,
+                                  cartan_second_homotopy, parallel_surjection_operator,
+                                  barratt_eccles_operator, 
+                                  parallel_barratt_eccles_operator, CartanPipeline,
+                                  cartan_operator, eilenberg_zilber, iter_steenrod_diagonal,
+                                  compositions, harmonic_partitions, shuffles)
+from simplicial_operators import aw_ez_shih, batch, combinatorics, packed, serialization, store
+from simplicial_operators.barratt_eccles import is_degenerate_element
+from simplicial_operators.surjections import is_degenerate_surjection
+from simplicial_operators.complexes import (array_action, steenrod_square, action_matrix,
+                                          SimplexIndex)
+from simplicial_operators.boundary import verify_shih, verify_steenrod, verify_cartan
+
+def random_word(rng, n, length):
+    '''returns a list of face and degeneracy maps composable from right to
+    left starting on n-simplices, and the dimension of their target'''
+
+    word = []
+    for _ in range(length):
+        if n > 0 and rng.random() < 0.5:
+            word.append(Operator(face_maps = [rng.randint(0, n)]))
+            n -= 1
+        else:
+            word.append(Operator(deg_maps = [rng.randint(0, n)]))
+            n += 1
+
+    return word[::-1], n
+
+def random_operators(rng, count, n=6, length=6):
+
+    answer = []
+    for _ in range(count):
+        word, _ = random_word(rng, n, rng.randint(0, length))
+        op = Operator()
+        for letter in word:
+            op = op.compose(letter)
+        answer.append(op)
+
+    return answer
+
+def random_element(rng, r, d):
+    '''returns a random nondegenerate Barratt-Eccles element of arity r and
+    dimension d'''
+
+    perms = list(permutations(range(1, r+1)))
+    while True:
+        element = tuple(rng.choice(perms) for _ in range(d+1))
+        if not is_degenerate_element(element):
+            return element
+
+def store_free(construction, *args):
+    '''returns the result of a construction computed with the store disabled'''
+
+    directory = store.get_directory()
+    store.set_directory(None)
+    try:
+        aw_ez_shih.cache_clear()
+        return construction(*args)
+    finally:
+        store.set_directory(directory)
+
+def written(method, *args, **kwargs):
+    '''returns what a write_* method writes to a file'''
+
+    file = StringIO()
+    method(*args, file, **kwargs)
+
+    return file.getvalue()
+
+def all_simplices(vertices, d):
+    '''returns the integer array of the d-simplices of the full simplex on a 
+    number of vertices'''
+
+    return np.array(list(combinations(range(vertices), d+1)), dtype=np.int64).reshape(-1, d+1)
+
+def test_f2chain_cancels_repeated_terms():
+
+    assert F2Chain([1, 2, 1, 3, 3, 3]) == {2, 3}
+    assert not F2Chain(iter_surjection_operator({(1,2,1), (2,1,2)}, 1))
+
+def test_compose_agrees_with_sequential_action():
+
+    rng = random.Random(0)
+    for _ in range(300):
+        n = rng.randint(0, 6)
+        word, _ = random_word(rng, n, rng.randint(1, 8))
+        simplex = tuple(range(10, 11+n))
+
+        expected = simplex
+        for letter in reversed(word):
+            expected = letter(expected)
+
+        k = rng.randint(0, len(word))
+        left, right = Operator(), Operator()
+        for letter in word[:k]:
+            left = left.compose(letter)
+        for letter in word[k:]:
+            right = right.compose(letter)
+
+        assert left.compose(right)(simplex) == expected
+        assert left(right(simplex)) == expected
+
+def test_nondegenerate_shih():
+
+    for n in range(8):
+        expected = {biop for biop in shih(n) if not Operator.is_degenerate(biop)}
+        assert shih(n, nondegenerate=True) == expected
+
+def test_table_reduction_is_operad_morphism():
+
+    rng = random.Random(1)
+    for _ in range(200):
+        r, s = rng.randint(1, 4), rng.randint(1, 4)
+        p = rng.randint(0, 3) if r > 1 else 0
+        q = rng.randint(0, 3) if s > 1 else 0
+        x, y = random_element(rng, r, p), random_element(rng, s, q)
+        i = rng.randint(1, r)
+
+        lhs = table_reduction(set(barratt_eccles_partial(x, i, y)))
+        rhs = surjection_partial(set(table_reduction(x)), i, set(table_reduction(y)))
+        assert lhs == rhs
+
+def test_surjection_pruning_agrees_with_filtering():
+
+    elements = cartan_first_homotopy(2) ^ cartan_second_homotopy(2)
+    surjections = set(table_reduction(elements)) | {(1,2,3,4,1,3), (1,1,2,3,4)}
+    nondegenerate = {surj for surj in surjections if not is_degenerate_surjection(surj)}
+
+    for n in range(7):
+        terms = surjection_operator(nondegenerate, n)
+        expected = {term for term in terms
+                    if term[0].degree == term[1].degree
+                    and term[2].degree == term[3].degree}
+        assert surjection_operator(surjections, n, ((0,1), (2,3)),
+                                   nondegenerate=True) == expected
+
+        expected = {term for term in surjection_operator(surjections, n)
+                    if term[0].degree == -1}
+        assert surjection_operator(surjections, n, degrees={0: -1}) == expected
+
+def test_packed_kernels_agree_with_operators():
+
+    rng = random.Random(2)
+    left = random_operators(rng, 200)
+    right = random_operators(rng, 200)
+
+    for op in left:
+        assert packed.unpack(packed.pack(op)) == op
+    assert packed.unpack_many(packed.pack_many(left)) == left
+
+    codes = packed.compose_many(packed.pack_many(left), packed.pack_many(right))
+    for a, b, code in zip(left, right, codes):
+        assert packed.packed_compose(packed.pack(a), packed.pack(b)) == packed.pack(a.compose(b))
+        assert packed.unpack(code) == a.compose(b)
+
+    primed = packed.prime_many(packed.pack_many(left))
+    assert packed.unpack_many(primed) == [op.prime() for op in left]
+
+    n = 6
+    simplices = np.arange(21).reshape(3, 7)
+    groups = {}
+    for op in {op for biop in steenrod_diagonal(2, n) for op in biop}:
+        groups.setdefault(op.degree, []).append(op)
+    for ops in groups.values():
+        values = packed.call_many(packed.pack_many(ops), simplices)
+        for k, op in enumerate(ops):
+            for t, simplex in enumerate(simplices.tolist()):
+                assert tuple(values[t, k]) == op(simplex)
+
+def test_verifiers():
+
+    assert verify_shih(6) is None
+    assert verify_steenrod(3, 7) is None
+    assert verify_cartan(3, 7) is None
+
+def test_store_round_trip(tmp_path):
+
+    directory = store.get_directory()
+    store.set_directory(tmp_path)
+    try:
+        large = {(Operator(face_maps = [70, 100]), Operator(deg_maps = [80]))}
+        assert store.save('large', (1,), large)
+        assert store.load('large', (1,)) == large
+
+        assert store.save('empty', (1,), F2Chain())
+        assert store.load('empty', (1,)) == frozenset()
+        assert store.load('missing', (1,)) is None
+
+        table = shih(4)
+        assert serialization.loads(serialization.dumps(table)) == table
+    finally:
+        store.set_directory(directory)
+
+def test_store_failures_fall_back_to_computing(tmp_path, monkeypatch):
+
+    directory = store.get_directory()
+    blocked = tmp_path / 'file'
+    blocked.write_bytes(b'')
+    try:
+        # a directory that cannot be created, read or written
+        store.set_directory(blocked)
+        aw_ez_shih.cache_clear()
+        with pytest.warns(UserWarning):
+            assert shih(3) == store_free(shih, 3)
+        assert store.load('shih', (3,)) is None
+        with pytest.warns(UserWarning):
+            assert not store.save('shih', (3,), shih(3))
+
+        # a write failing midway, as on a full disk, leaves no file behind
+        store.set_directory(tmp_path / 'store')
+        def replace(source, target):
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        monkeypatch.setattr(os, 'replace', replace)
+        with pytest.warns(UserWarning):
+            assert not store.save('shih', (3,), shih(3))
+        assert os.listdir(tmp_path / 'store' / ('v%d' % store.VERSION)) == []
+    finally:
+        store.set_directory(directory)
+        aw_ez_shih.cache_clear()
+
+def test_display():
+
+    biops = shih(3)
+    full = written(Operator.write_display, biops)
+    assert Operator.display(biops) == full
+    lines = full.split('\n')
+    assert len(lines) == len(biops) and lines[0].startswith('  ')
+    assert all(line.startswith('+ ') for line in lines[1:])
+
+    truncated = written(Operator.write_display, biops, limit=2, summary=True)
+    assert truncated.startswith('\n'.join(lines[:2]) + '\n+ ... %d more terms' % 
+                                (len(biops) - 2))
+    degrees = {}
+    for biop in biops:
+        key = (biop[0].degree, biop[1].degree)
+        degrees[key] = degrees.get(key, 0) + 1
+    assert truncated.endswith('\n\n%d terms\ndegrees: ' % len(biops) + 
+                              ', '.join(f'{key}: {k}' for key, k in sorted(degrees.items())))
+
+    assert written(Operator.write_display, biops, limit=0) == (
+        '  ... %d more terms' % len(biops))
+
+def test_display_action():
+
+    op = Operator(face_maps = [1])
+    assert Operator.display_action(op, {(0,1,2), (1,2,3)}) in ('  (0, 2)\n+ (1, 3)', 
+                                                              '  (1, 3)\n+ (0, 2)')
+    assert written(Operator.write_action, op, set()) == '0'
+    assert written(Operator.write_action, op, set(), summary=True) == (
+        '0\n\n0 terms\ndimensions: ')
+    assert written(Operator.write_action, op, {(0,1,2)}, limit=0, summary=True) == (
+        '  ... 1 more terms\n\n1 terms\ndimensions: 1: 1')
+
+def test_parallel_agrees_with_serial():
+
+    pipeline = CartanPipeline()
+    surjections = pipeline.surjections(3)
+    elements = pipeline.elements(2)
+    equal_degrees = CartanPipeline.equal_degrees
+
+    with ProcessPoolExecutor(2) as executor:
+        for n in (6, 9):
+            assert parallel_surjection_operator(
+                surjections, n, equal_degrees, nondegenerate=True, max_workers=2,
+                executor=executor) == surjection_operator(
+                surjections, n, equal_degrees, nondegenerate=True)
+            assert parallel_barratt_eccles_operator(
+                elements, n, equal_degrees, nondegenerate=True, max_workers=2,
+                executor=executor) == barratt_eccles_operator(
+                elements, n, equal_degrees, nondegenerate=True)
+
+        # searches small enough to end while being split, and a chunk per subtree
+        for n in (0, 1, 5):
+            assert parallel_surjection_operator(
+                (1,2,1,2), n, max_workers=2, chunksize=1, 
+                executor=executor) == surjection_operator((1,2,1,2), n)
+
+    directory = store.get_directory()
+    store.set_directory(None)
+    try:
+        assert (CartanPipeline(max_workers=2).operator(3, 10) == 
+                CartanPipeline().operator(3, 10))
+    finally:
+        store.set_directory(directory)
+
+def test_array_action_agrees_with_operator_action():
+
+    cases = [(Operator(face_maps = [1]), 3),
+             (Operator(deg_maps = [2, 0], face_maps = [3]), 3),
+             (steenrod_diagonal(1, 3), 3), (shih(3), 3), (cartan_operator(1, 4), 4)]
+    for multiop, n in cases:
+        chain = F2Chain(multiop) if isinstance(multiop, set) else F2Chain({multiop})
+        simplices = all_simplices(6, n)
+
+        # the action on each simplex, with the factors of a term concatenated
+        expected = {}
+        for simplex in map(tuple, simplices.tolist()):
+            for term in chain:
+                factors = term(simplex) if isinstance(term, Operator) else (
+                    tuple(op(simplex) for op in term))
+                factors = (factors,) if isinstance(term, Operator) else factors
+                key = tuple(len(factor)-1 for factor in factors)
+                expected.setdefault(key, F2Chain()).toggle(sum(factors, ()))
+
+        answer = array_action(multiop, simplices)
+        assert {key for key, rows in answer.items() if len(rows)} == {
+            key for key, rows in expected.items() if rows}
+        for key, rows in answer.items():
+            assert [tuple(row) for row in rows.tolist()] == sorted(expected[key])
+
+        for key, rows in array_action(multiop, simplices, reduce=False).items():
+            assert F2Chain(map(tuple, rows.tolist())) == expected[key]
+
+    assert array_action(Operator(face_maps = [0]), (4, 5, 7))[(1,)].tolist() == [[5, 7]]
+
+def test_steenrod_square_agrees_with_cup_product():
+
+    rng = np.random.default_rng(3)
+    for d, k in ((1, 0), (1, 1), (2, 1), (2, 2), (3, 1), (2, 3)):
+        faces, simplices = all_simplices(7, d), all_simplices(7, d+k)
+        cochains = rng.integers(0, 2, (11, len(faces)))
+        position = {tuple(face): j for j, face in enumerate(faces.tolist())}
+
+        # Sq^k(a)(x) is the sum of a(L)a(R) over the terms L x R of cup_{d-k}(x)
+        expected = np.zeros((len(cochains), len(simplices)), dtype=bool)
+        if k <= d:
+            biops = steenrod_diagonal(d-k, d+k)
+            for t, simplex in enumerate(map(tuple, simplices.tolist())):
+                for left, right in F2Chain(biops).act_on((simplex, simplex)):
+                    if len(left) == len(right) == d+1:
+                        expected[:, t] ^= (cochains[:, position[left]] & 
+                                           cochains[:, position[right]]).astype(bool)
+
+        answer = steenrod_square(k, cochains, faces, simplices)
+        assert answer.dtype == bool and (answer == expected).all()
+        assert (steenrod_square(k, cochains[4], faces, simplices) == expected[4]).all()
+
+        supports = [np.flatnonzero(row).tolist() for row in cochains]
+        assert (steenrod_square(k, supports, faces, simplices, format='support') == 
+                expected).all()
+        assert (steenrod_square(k, supports[4], faces, simplices, format='support') == 
+                expected[4]).all()
+
+        bits = np.packbits(cochains.astype(bool), axis=0).T
+        packed_answer = steenrod_square(k, bits, faces, simplices, format='packed')
+        assert (np.unpackbits(packed_answer.T, axis=0, count=len(cochains)) == 
+                expected).all()
+
+        try:
+            from scipy import sparse
+        except ImportError:
+            continue
+        assert (steenrod_square(k, sparse.csr_matrix(cochains), faces, simplices) == 
+                expected).all()
+
+    with pytest.raises(ValueError):
+        steenrod_square(1, np.zeros((1, 3)), all_simplices(4, 1), all_simplices(4, 2))
+
+def test_action_matrix_agrees_with_operator_action():
+
+    cases = [(Operator(face_maps = [1]), 3), (Operator(deg_maps = [0]), 2),
+             (steenrod_diagonal(1, 3), 3), (shih(3), 3), (cartan_operator(1, 4), 4)]
+    for multiop, n in cases:
+        chain = F2Chain(multiop) if isinstance(multiop, set) else F2Chain({multiop})
+        terms = [term if isinstance(term, tuple) else (term,) for term in chain]
+        source = all_simplices(6, n)
+
+        for dims in {tuple(n + op.degree for op in term) for term in terms}:
+            targets = [all_simplices(6, m) for m in dims]
+            position = [{tuple(row): j for j, row in enumerate(target.tolist())}
+                        for target in targets]
+            shape = tuple(len(target) for target in targets)
+
+            # the nondegenerate images of each source simplex
+            expected = np.zeros((int(np.prod(shape)), len(source)), dtype=np.uint8)
+            for j, simplex in enumerate(map(tuple, source.tolist())):
+                for term in terms:
+                    image = tuple(op(simplex) for op in term)
+                    if (tuple(len(spx)-1 for spx in image) != dims or 
+                        any(spx[t] == spx[t+1] for spx in image for t in range(len(spx)-1))):
+                        continue
+                    row = np.ravel_multi_index([p[spx] for p, spx in zip(position, image)],
+                                               shape)
+                    expected[row, j] ^= 1
+
+            packed_matrix = action_matrix(multiop, source, targets, format='packed')
+            assert (np.unpackbits(packed_matrix, axis=1, count=len(source)) == 
+                    expected).all()
+
+            indices = [SimplexIndex(target) for target in targets]
+            try:
+                import scipy
+            except ImportError:
+                continue
+            matrix = action_matrix(multiop, source, indices)
+            assert matrix.format == 'csr' and (matrix.toarray() == expected).all()
+
+def test_combinatorics_round_trip():
+
+    # (family, elements in the order of the generator, arguments of count_, 
+    # unrank_ and iter_, extra arguments of rank_)
+    cases = [('combinations', list(combinations(range(n), k)), (n, k), (n,))
+             for n in range(7) for k in range(n+2)]
+    cases += [('compositions', list(compositions(n, k, l, m)), (n, k, l, m), (l, m))
+              for n, k, l, m in ((6, 3, 1, None), (7, 3, 0, 4), (5, 2, 2, 2), (8, 4, 1, 3))]
+    cases += [('harmonic_partitions', list(harmonic_partitions(n, k, l)), (n, k, l), (n, l))
+              for n, k, l in ((12, 3, 1), (9, 2, 0), (15, 4, 1))]
+    cases += [('shuffles', list(shuffles(p, q)), (p, q), ())
+              for p, q in ((0, 3), (2, 3), (3, 4))]
+
+    for family, elements, args, rank_args in cases:
+        count = getattr(combinatorics, 'count_' + family)
+        rank = getattr(combinatorics, 'rank_' + family[:-1])
+        unrank = getattr(combinatorics, 'unrank_' + family[:-1])
+        iterate = getattr(combinatorics, 'iter_' + family)
+
+        size = len(elements)
+        assert count(*args) == size
+        assert [unrank(r, *args) for r in range(size)] == elements
+        assert [rank(element, *rank_args) for element in elements] == list(range(size))
+        assert list(iterate(*args)) == elements
+        for start in range(size+1):
+            for stop in (start, start+1, start+3, size, size+2):
+                assert list(iterate(*args, start, stop)) == elements[start:stop]
+        with pytest.raises(IndexError):
+            unrank(size, *args)
+
+def test_disjoint_index_ranges_add_to_the_full_table():
+
+    ranges = [(0, 3), (3, 10), (10, 11), (11, None)]
+
+    for i, n in ((0, 5), (2, 7), (3, 9)):
+        assert F2Chain.sum(steenrod_diagonal(i, n, r) for r in ranges) == (
+            steenrod_diagonal(i, n))
+        assert F2Chain.sum(F2Chain(iter_steenrod_diagonal(i, n, r)) for r in ranges) == (
+            steenrod_diagonal(i, n))
+
+    for p, q in ((2, 3), (4, 4), (1, 6)):
+        assert F2Chain.sum(eilenberg_zilber(p, q, index_range=r) for r in ranges) == (
+            eilenberg_zilber(p, q))
+
+    elements = cartan_first_homotopy(3) ^ cartan_second_homotopy(3)
+    assert F2Chain.sum(table_reduction(elements, r) for r in ranges) == (
+        table_reduction(elements))
+
+def test_batch_resumes_from_checkpoint(tmp_path, monkeypatch):
+
+    manifest = {'jobs': [{'construction': 'shih', 'grid': {'n': [2, 3]}},
+                         {'construction': 'eilenberg_zilber', 'grid': {'n': [2]}},
+                         {'construction': 'cartan_operator', 
+                          'grid': {'i': [1], 'n': [4, 5]}}]}
+    output = str(tmp_path / 'results')
+    directory = store.get_directory()
+
+    # interrupting the run at its fourth task
+    calls = []
+    def interrupted(i, n):
+        calls.append((i, n))
+        raise KeyboardInterrupt
+    monkeypatch.setitem(batch.CONSTRUCTIONS, 'cartan_operator', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        batch.run(manifest, output, log=StringIO())
+    assert calls == [(1, 4)] and store.get_directory() == directory
+
+    with open(os.path.join(output, batch.CHECKPOINT)) as file:
+        done = json.load(file)['done']
+    assert sorted(done) == sorted(['shih[n=2].sops', 'shih[n=3].sops',
+                                   'eilenberg_zilber[n=2].sops'])
+
+    # resuming computes only the remaining tasks
+    monkeypatch.undo()
+    assert batch.run(manifest, output, log=StringIO()) == 2
+    assert batch.run(manifest, output, log=StringIO()) == 0
+    assert store.get_directory() == directory
+
+    def written(name):
+        with open(os.path.join(output, name), 'rb') as file:
+            return serialization.load(file)
+
+    assert written('shih[n=3].sops') == shih(3)
+    for key, table in eilenberg_zilber(2).items():
+        assert written(batch.filename('eilenberg_zilber', {'n': 2, 'key': key})) == table
+    assert written('cartan_operator[i=1,n=4].sops') == cartan_operator(1, 4)
+    assert written('cartan_operator[i=1,n=5].sops') == cartan_operator(1, 5)
+
+    assert batch.run(manifest, output, restart=True, log=StringIO()) == 5
+
+def test_batch_eta():
+
+    assert batch._eta(10, 1, 10001) == '27:46:40'
+    assert batch._eta(3, 3, 4) == '0:00:01'